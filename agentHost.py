@@ -0,0 +1,155 @@
+# agentHost.py
+# ------------
+# Long-lived worker processes that play many games each.
+
+"""
+Warm agent hosts for tournaments.
+
+An AgentHost is a child process that plays games on request.  It imports
+the engine once and compiles each team file once (see capture.loadAgents'
+moduleCache), and keeps them for the life of the process, so module-level
+caches of the modules teams import, such as distanceCalculator.distanceMap,
+are computed once per host instead of once per game.  The team file itself
+runs into a fresh module for every game and colour, exactly as in a cold
+capture.py run, so a warm host plays the same games: module globals of a
+team (a list of its agents, say) never carry over between games or leak
+from one colour to the other.
+
+The host speaks a small protocol over a pipe:
+
+  ('play', (red, blue, layout, length, catchExceptions, seed))
+      Resets the per-game engine state (random seed, muted output), runs
+      the cached team code into fresh modules, builds the agents with
+      createTeam and plays one headless game.  Replies (score, error).
+  ('reload', None)
+      Forgets the compiled team files and maze distances, e.g. after a team
+      file changed.  Replies True.
+  ('stop', None)
+      Exits the host.
+
+AgentHostPool spreads games over several hosts and calls back with
+(key, score, error) as each game ends, much like multiprocessing.Pool's
+apply_async; bracket.py and series.py use it.
+"""
+
+import sys, threading
+import multiprocessing
+import Queue
+import capture, distanceCalculator
+
+def _serve(conn):
+  "Main loop of a host process."
+  moduleCache = {}
+  while True:
+    try:
+      command, args = conn.recv()
+    except (EOFError, KeyboardInterrupt):
+      return
+    if command == 'stop':
+      return
+    elif command == 'reload':
+      moduleCache.clear()
+      distanceCalculator.distanceMap.clear()
+      conn.send(True)
+    elif command == 'play':
+      red, blue, layout, length, catchExceptions, seed = args
+      try:
+        score = capture.runHeadlessGame(red, blue, layout, length, catchExceptions=catchExceptions,
+                                        seed=seed, moduleCache=moduleCache)
+        conn.send((score, None))
+      except Exception, e:
+        conn.send((0, '%s: %s' % (type(e).__name__, e)))
+
+class AgentHost:
+  "Handle on one host process."
+  def __init__(self):
+    self.conn, child = multiprocessing.Pipe()
+    self.process = multiprocessing.Process(target=_serve, args=(child,))
+    self.process.daemon = True
+    self.process.start()
+    child.close()
+    self.gamesPlayed = 0
+
+  def play(self, red, blue, layout, length=1200, catchExceptions=True, seed=None):
+    "Plays one game in the host and returns (score, error)."
+    self.conn.send(('play', (red, blue, layout, length, catchExceptions, seed)))
+    result = self.conn.recv()
+    self.gamesPlayed += 1
+    return result
+
+  def reload(self):
+    self.conn.send(('reload', None))
+    return self.conn.recv()
+
+  def stop(self):
+    "Asks the host to exit once its current game is over."
+    try:
+      self.conn.send(('stop', None))
+    except IOError:
+      pass
+    self.process.join()
+
+  def terminate(self):
+    if self.process.is_alive():
+      self.process.terminate()
+    self.process.join()
+
+class AgentHostPool:
+  """
+  A fixed set of AgentHosts fed from one queue of games.  Each host is
+  driven by a dispatcher thread in this process; a host that dies (e.g.
+  an agent calling os._exit) is replaced and its game reported as failed.
+  """
+  def __init__(self, numHosts=None):
+    self.numHosts = numHosts or multiprocessing.cpu_count()
+    self.tasks = Queue.Queue()
+    self.closed = False
+    self.hosts = [AgentHost() for i in range(self.numHosts)]
+    self.threads = []
+    for i in range(self.numHosts):
+      thread = threading.Thread(target=self._dispatch, args=(i,))
+      thread.daemon = True
+      thread.start()
+      self.threads.append(thread)
+
+  def playGame(self, key, red, blue, layout, length=1200, catchExceptions=True, seed=None, callback=None,
+               cancelled=None):
+    """
+    Queues a game; callback((key, score, error)) is called from a
+    dispatcher thread once it has been played.  If cancelled() is true
+    when a host gets to the game, the game is dropped without a callback,
+    so games nobody needs any more do not hold up the ones behind them.
+    """
+    self.tasks.put((key, (red, blue, layout, length, catchExceptions, seed), callback, cancelled))
+
+  def _dispatch(self, i):
+    while not self.closed:
+      task = self.tasks.get()
+      if task == None or self.closed: return
+      key, spec, callback, cancelled = task
+      if cancelled and cancelled(): continue
+      try:
+        score, error = self.hosts[i].play(*spec)
+      except (EOFError, IOError):
+        if self.closed: return
+        print >>sys.stderr, 'Agent host %d exited; restarting it' % i
+        self.hosts[i].terminate()
+        self.hosts[i] = AgentHost()
+        score, error = 0, 'agent host exited'
+      if self.closed: return
+      if callback: callback((key, score, error))
+
+  def gamesPlayed(self):
+    return sum([host.gamesPlayed for host in self.hosts])
+
+  def close(self):
+    "Stops the hosts once their current games end."
+    self.closed = True
+    for i in range(self.numHosts): self.tasks.put(None)
+    for host in self.hosts: host.stop()
+
+  def terminate(self):
+    "Kills the hosts, abandoning any games in progress."
+    self.closed = True
+    for i in range(self.numHosts): self.tasks.put(None)
+    for host in self.hosts: host.terminate()
@@ -0,0 +1,99 @@
+# agentProfiler.py
+# ----------------
+# Deterministic profiling of a single agent.
+
+"""
+Profiles one agent's registerInitialState and getAction calls with cProfile,
+leaving the engine's own work out of the numbers.
+
+  python capture.py --profile-agent 1 --profile-output slowAgent -n 5
+
+writes slowAgent.pstats (for pstats or snakeviz) and slowAgent.collapsed,
+one 'frame;frame;frame microseconds' line per call stack, which
+flamegraph.pl, speedscope and similar flame graph tools read directly.
+
+cProfile only records caller/callee pairs, not whole stacks, so the
+collapsed stacks are rebuilt by walking down from the entry points and
+splitting each function's time between its callers in proportion to the
+time spent under each of them.
+"""
+
+import cProfile, pstats, os
+
+MAX_DEPTH = 100
+MIN_MICROSECONDS = 1
+
+def functionLabel(func):
+  fileName, line, name = func
+  if fileName == '~':  # built-in
+    return name
+  return '%s:%d(%s)' % (os.path.basename(fileName), line, name)
+
+def collapsedStacks(stats):
+  """
+  Turns a pstats.Stats into a dict from 'a;b;c' stack strings to
+  microseconds of self time.
+  """
+  raw = stats.stats
+  children = {}
+  for func, (cc, nc, tt, ct, callers) in raw.items():
+    for caller, edge in callers.items():
+      children.setdefault(caller, []).append((func, edge))
+  roots = [func for func, entry in raw.items() if not entry[4]]
+
+  stacks = {}
+  def walk(func, path, selfTime, inclusive):
+    path = path + [functionLabel(func)]
+    if selfTime * 1e6 >= MIN_MICROSECONDS:
+      key = ';'.join(path)
+      stacks[key] = stacks.get(key, 0) + selfTime * 1e6
+    total = raw[func][3]
+    if total <= 0 or len(path) >= MAX_DEPTH: return
+    share = inclusive / total  # the part of func's time spent on this path
+    onPath.add(func)
+    for child, edge in children.get(func, []):
+      if child in onPath: continue  # recursion is folded into the outer call
+      edgeSelf, edgeInclusive = edge[2] * share, edge[3] * share
+      if edgeInclusive * 1e6 >= MIN_MICROSECONDS:
+        walk(child, path, edgeSelf, edgeInclusive)
+    onPath.discard(func)
+
+  onPath = set()
+  for root in roots:
+    walk(root, [], raw[root][2], raw[root][3])
+  return stacks
+
+class AgentProfiler:
+  """
+  Wraps an agent's registerInitialState and getAction so that only they
+  run under the profiler.  The same profile accumulates over every game
+  the agent plays.
+  """
+  def __init__(self, agentIndex, outputPrefix=None):
+    self.agentIndex = agentIndex
+    self.outputPrefix = outputPrefix or 'agent%d-profile' % agentIndex
+    self.profile = cProfile.Profile()
+    self.calls = 0
+
+  def attach(self, agent):
+    for name in ['registerInitialState', 'getAction']:
+      if hasattr(agent, name):
+        setattr(agent, name, self._profiled(getattr(agent, name)))
+
+  def _profiled(self, function):
+    def call(*args, **keyArgs):
+      self.calls += 1
+      return self.profile.runcall(function, *args, **keyArgs)
+    return call
+
+  def write(self):
+    "Writes the .pstats and .collapsed files and returns their names."
+    stats = pstats.Stats(self.profile)
+    statsFile = self.outputPrefix + '.pstats'
+    stats.dump_stats(statsFile)
+    collapsedFile = self.outputPrefix + '.collapsed'
+    with open(collapsedFile, 'w') as f:
+      for stack, micros in sorted(collapsedStacks(stats).items()):
+        if int(micros) > 0:
+          f.write('%s %d\n' % (stack, int(micros)))
+    return statsFile, collapsedFile
@@ -0,0 +1,176 @@
+# agentSandbox.py
+# ---------------
+# Runs capture agents in child processes.
+
+"""
+Out-of-process agents.
+
+SandboxedAgent stands in for an agent inside the engine.  The real agent
+lives in a forked child process; the engine side sends it compact game
+states (capture.packGameState, marshalled, with the layout sent once per
+game) and receives actions over a pipe.  Because the engine only waits on
+the pipe, time limits are enforced by the parent to the millisecond with
+poll() rather than by SIGALRM inside the agent's own process, and an agent
+that hangs, crashes hard or eats memory (see memoryLimit) only takes its
+own process down.
+
+A child that timed out or died is discarded.  The next game forks a new
+child from the untouched agent object kept in the engine process, so the
+agent starts it as fresh as it started the first game.
+
+Use it from the command line with 'python capture.py --sandbox'.
+"""
+
+import sys, os, time, marshal, traceback
+import multiprocessing
+from game import Agent
+from util import TimeoutFunctionException, Deadline
+import capture
+
+class AgentSandboxException(Exception):
+  "Raised in the engine when a sandboxed agent fails; carries the child's traceback."
+  pass
+
+def _serve(conn, agent, mute, memoryLimit):
+  "Main loop of the child process hosting agent."
+  import __main__
+  __main__.__dict__.pop('_display', None)  # the Tk display belongs to the engine process
+  if mute:
+    devnull = open(os.devnull, 'w')
+    sys.stdout = sys.stderr = devnull
+  if memoryLimit:
+    import resource
+    resource.setrlimit(resource.RLIMIT_AS, (memoryLimit, memoryLimit))
+
+  def setDeadline(remaining):
+    # Deadlines are re-created from the time left, as clocks are per process
+    if remaining != None and hasattr(agent, 'setMoveDeadline'):
+      agent.setMoveDeadline(Deadline(*remaining))
+
+  layout = None
+  observation = None
+  while True:
+    try:
+      command, args = conn.recv()
+    except (EOFError, KeyboardInterrupt):
+      return
+    try:
+      if command == 'init':
+        layoutText, packed, remaining = args
+        setDeadline(remaining)
+        import layout as layoutModule
+        layout = layoutModule.Layout(layoutText)
+        agent.registerInitialState(capture.unpackGameState(marshal.loads(packed), layout))
+        reply = None
+      elif command == 'observe':
+        state = capture.unpackGameState(marshal.loads(args), layout)
+        if hasattr(agent, 'observationFunction'):
+          observation = agent.observationFunction(state)
+        else:
+          observation = state
+        reply = None
+      elif command == 'act':
+        setDeadline(args)
+        reply = agent.getAction(observation)
+      elif command == 'final':
+        if hasattr(agent, 'final'):
+          agent.final(capture.unpackGameState(marshal.loads(args), layout))
+        reply = None
+      elif command == 'stop':
+        return
+      conn.send(('ok', reply))
+    except Exception:
+      conn.send(('error', traceback.format_exc()))
+
+class SandboxedAgent(Agent):
+  """
+  Engine-side proxy for an agent running in a child process.  When
+  startupTimeout and moveTimeout are given they are enforced here, to
+  sub-second precision; a move's budget covers both observationFunction
+  and getAction, as in Game.run.
+  """
+  def __init__(self, agent, mute=False, startupTimeout=None, moveTimeout=None, memoryLimit=None):
+    Agent.__init__(self, agent.index)
+    self.agent = agent
+    self.mute = mute
+    self.startupTimeout = startupTimeout
+    self.moveTimeout = moveTimeout
+    self.memoryLimit = memoryLimit
+    self.process = None
+    self.conn = None
+    self.moveStart = None
+    self.deadline = None
+
+  def _start(self):
+    self._stop()
+    self.conn, child = multiprocessing.Pipe()
+    self.process = multiprocessing.Process(target=_serve, args=(child, self.agent, self.mute, self.memoryLimit))
+    self.process.daemon = True
+    self.process.start()
+    child.close()
+
+  def _stop(self):
+    if self.process != None:
+      if self.process.is_alive(): self.process.terminate()
+      self.process.join()
+      self.conn.close()
+    self.process = None
+
+  def _call(self, command, args, timeout=None):
+    """
+    Sends a command to the child and returns its reply, raising
+    TimeoutFunctionException if none arrives within timeout seconds.
+    """
+    if self.process == None:
+      raise AgentSandboxException('Agent %d has no running process' % self.index)
+    try:
+      self.conn.send((command, args))
+      if timeout != None and not self.conn.poll(max(0, timeout)):
+        raise TimeoutFunctionException()
+      status, reply = self.conn.recv()
+    except BaseException:
+      # Whatever happened, the child may still be busy with this command
+      self._stop()
+      raise
+    if status == 'error':
+      raise AgentSandboxException('Agent %d raised an exception:\n%s' % (self.index, reply))
+    return reply
+
+  def registerInitialState(self, gameState):
+    if self.process == None or not self.process.is_alive():
+      self._start()
+    packed = marshal.dumps(capture.packGameState(gameState))
+    self._call('init', (gameState.data.layout.layoutText, packed, self._remaining()), self.startupTimeout)
+
+  def observationFunction(self, gameState):
+    self.moveStart = time.time()
+    self._call('observe', marshal.dumps(capture.packGameState(gameState)), self.moveTimeout)
+    return gameState
+
+  def getAction(self, gameState):
+    timeout = self.moveTimeout
+    if timeout != None and self.moveStart != None:
+      timeout -= time.time() - self.moveStart
+    self.moveStart = None
+    return self._call('act', self._remaining(), timeout)
+
+  def setMoveDeadline(self, deadline):
+    self.deadline = deadline
+
+  def _remaining(self):
+    "The current deadline as (time left, warning time left), for the child."
+    if self.deadline == None: return None
+    return (self.deadline.timeRemaining(), self.deadline.warningTimeRemaining())
+
+  def final(self, gameState):
+    if self.process == None: return
+    self._call('final', marshal.dumps(capture.packGameState(gameState)), self.moveTimeout)
+
+  def shutdown(self):
+    if self.process != None and self.process.is_alive():
+      try:
+        self.conn.send(('stop', None))
+        self.process.join(1)
+      except IOError:
+        pass
+    self._stop()
@@ -0,0 +1,156 @@
+# engineBenchmarks.py
+# -------------------
+# The capture engine benchmarks run by runBenchmarks.py.
+
+"""
+Benchmarks of the capture engine.
+
+Each Benchmark has a setup function that builds its inputs outside the
+timed region and returns (operation, count, timer): every call to
+operation() does count units of work, and timer, if not None, is a
+phaseTimer.PhaseTimer that operation records turn timings into.
+
+  state.*             GameState.generateSuccessor, makeObservation and
+                      deepCopy on a mid-game state of defaultCapture
+  grid.*              Grid copying, indexing, asList, count and bit packing
+  computeDistances.*  all-pairs maze distances, once per layout
+  getDistance         Distancer.getDistance between random legal positions
+  game.*              full 1200-move games of baselineTeam against itself,
+                      once per layout in layouts/
+
+Games are seeded, start with an empty distanceCalculator.distanceMap (as
+the first game of a capture.py run does) and are played without timeouts.
+"""
+
+import os, random, glob
+import capture, layout, distanceCalculator, textDisplay, phaseTimer, util
+from game import Grid
+
+LAYOUT = 'defaultCapture'
+GAME_LENGTH = 1200
+WARMUP_MOVES = 100  # moves played before the state benchmarks are taken
+
+class Benchmark:
+  def __init__(self, name, setup, unit='op'):
+    self.name = name
+    self.setup = setup
+    self.unit = unit
+
+def layoutNames():
+  "The names of every layout in layouts/, which must be in the current directory."
+  return sorted([os.path.basename(f)[:-4] for f in glob.glob(os.path.join('layouts', '*.lay'))])
+
+def midGameState(layoutName=LAYOUT, moves=WARMUP_MOVES):
+  "A state reached by playing moves random (but seeded) legal actions."
+  state = capture.GameState()
+  state.initialize(layout.getLayout(layoutName), 4)
+  state.data.timeleft = GAME_LENGTH
+  rng = random.Random(0)
+  for i in range(moves):
+    agentIndex = i % 4
+    state = state.generateSuccessor(agentIndex, rng.choice(state.getLegalActions(agentIndex)))
+  return state
+
+####################
+# State benchmarks #
+####################
+
+def generateSuccessorSetup():
+  state = midGameState()
+  moves = [(i, action) for i in range(4) for action in state.getLegalActions(i)]
+  def operation():
+    for agentIndex, action in moves:
+      state.generateSuccessor(agentIndex, action)
+  return operation, len(moves), None
+
+def makeObservationSetup():
+  state = midGameState()
+  def operation():
+    for i in range(4):
+      state.makeObservation(i)
+  return operation, 4, None
+
+def deepCopySetup():
+  state = midGameState()
+  return state.deepCopy, 1, None
+
+###################
+# Grid benchmarks #
+###################
+
+def gridSetup(name):
+  def setup():
+    grid = midGameState().data.food
+    if name == 'index':
+      cells = [(x, y) for x in range(grid.width) for y in range(grid.height)]
+      def operation():
+        for x, y in cells:
+          grid[x][y]
+      return operation, len(cells), None
+    if name == 'unpackBits':
+      bits = grid.packBits()
+      return lambda: Grid(grid.width, grid.height, bitRepresentation=bits), 1, None
+    return getattr(grid, name), 1, None
+  return setup
+
+#######################
+# Distance benchmarks #
+#######################
+
+def computeDistancesSetup(layoutName):
+  def setup():
+    theLayout = layout.getLayout(layoutName)
+    return lambda: distanceCalculator.computeDistances(theLayout), 1, None
+  return setup
+
+def getDistanceSetup():
+  theLayout = layout.getLayout(LAYOUT)
+  distancer = distanceCalculator.Distancer(theLayout)
+  distancer.getMazeDistances()
+  positions = theLayout.walls.asList(False)
+  rng = random.Random(0)
+  pairs = [(rng.choice(positions), rng.choice(positions)) for i in range(1000)]
+  def operation():
+    for pos1, pos2 in pairs:
+      distancer.getDistance(pos1, pos2)
+  return operation, len(pairs), None
+
+###################
+# Game benchmarks #
+###################
+
+def gameSetup(layoutName, team='baselineTeam'):
+  def setup():
+    theLayout = layout.getLayout(layoutName)
+    moduleCache = {}
+    timer = phaseTimer.PhaseTimer()
+    def operation():
+      random.seed(0)
+      distanceCalculator.distanceMap.clear()
+      util.mutePrint()
+      try:
+        redAgents = capture.loadAgents(True, team, True, {}, moduleCache)
+        blueAgents = capture.loadAgents(False, team, True, {}, moduleCache)
+        agents = sum([list(el) for el in zip(redAgents, blueAgents)], [])
+        g = capture.CaptureRules(quiet=True).newGame(theLayout, agents, textDisplay.NullGraphics(),
+                                                     GAME_LENGTH, True, False)
+        g.timer = timer
+        g.run()
+      finally:
+        util.unmutePrint()
+    return operation, 1, timer
+  return setup
+
+def allBenchmarks():
+  "Every benchmark, in the order they are run."
+  benchmarks = [Benchmark('state.generateSuccessor', generateSuccessorSetup),
+                Benchmark('state.makeObservation', makeObservationSetup),
+                Benchmark('state.deepCopy', deepCopySetup)]
+  for name in ['copy', 'index', 'asList', 'count', 'packBits', 'unpackBits']:
+    benchmarks.append(Benchmark('grid.' + name, gridSetup(name), 'cell' if name == 'index' else 'op'))
+  for name in layoutNames():
+    benchmarks.append(Benchmark('computeDistances.' + name, computeDistancesSetup(name)))
+  benchmarks.append(Benchmark('getDistance', getDistanceSetup))
+  for name in layoutNames():
+    benchmarks.append(Benchmark('game.' + name, gameSetup(name), 'game'))
+  return benchmarks
@@ -0,0 +1,270 @@
+# runBenchmarks.py
+# ----------------
+# Runs the capture engine benchmarks and compares their results.
+
+"""
+Usage:
+
+  python benchmarks/runBenchmarks.py                      run everything, write benchmark-results.json
+  python benchmarks/runBenchmarks.py -b state,grid -o new.json
+  python benchmarks/runBenchmarks.py --compare old.json new.json
+  python benchmarks/runBenchmarks.py --check benchmarks/baseline.json
+
+Each benchmark is set up once, called once to warm up and then timed for
+--repeats repeats of at least --minTime seconds each (one call at least),
+with garbage collection off as in timeit.  The results file holds the
+time per unit of every repeat together with their median; --compare
+prints how each benchmark's median moved between two results files.
+
+--check reruns the benchmarks of a stored baseline and exits with status 1
+if any of them got significantly slower.  A benchmark has regressed when
+both
+
+  - its median time grew by more than its threshold: --threshold percent,
+    or twice the run-to-run noise of the two runs if that is larger (noise
+    being the median absolute deviation of the repeats relative to their
+    median), and
+  - a one-sided Mann-Whitney U test over the repeats says the new times
+    are larger with p below --alpha; with 5 repeats on each side the
+    smallest possible p is 0.004.
+
+Load on the machine can shift a whole run, which the repeats within it
+cannot see, so a benchmark that looks regressed is measured again up to
+--retries times and only fails if every attempt does.
+
+Baselines are only comparable on the machine and Python that made them;
+regenerate benchmarks/baseline.json with -o after an intended change.
+
+See engineBenchmarks.py for the benchmarks themselves.
+"""
+
+import sys, os, time, gc, json, platform, timeit, math
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import engineBenchmarks
+
+def median(values):
+  values = sorted(values)
+  middle = len(values) / 2
+  if len(values) % 2: return values[middle]
+  return (values[middle - 1] + values[middle]) / 2.0
+
+def relativeNoise(values):
+  "Median absolute deviation over median."
+  middle = median(values)
+  if middle == 0: return 0.0
+  return median([abs(v - middle) for v in values]) / middle
+
+def mannWhitneyP(old, new):
+  """
+  One-sided p-value of the Mann-Whitney U test against the hypothesis that
+  new values are not larger than old ones.  Exact for small samples (ties
+  count half), normal approximation otherwise.
+  """
+  n, m = len(new), len(old)
+  u = 0.0
+  for a in new:
+    for b in old:
+      if a > b: u += 1
+      elif a == b: u += 0.5
+  if n * m > 400:
+    mean = n * m / 2.0
+    deviation = math.sqrt(n * m * (n + m + 1) / 12.0)
+    z = (u - 0.5 - mean) / deviation
+    return 0.5 * math.erfc(z / math.sqrt(2))
+  # ways[u] = orderings of n new and m old values with statistic u, built up one value at a time
+  counts = {}
+  def ways(n, m, u):
+    if u < 0: return 0
+    if n == 0 or m == 0: return int(u == 0)
+    key = (n, m, u)
+    if key not in counts:
+      counts[key] = ways(n - 1, m, u - m) + ways(n, m - 1, u)
+    return counts[key]
+  total = sum([ways(n, m, k) for k in range(n * m + 1)])
+  atLeast = sum([ways(n, m, k) for k in range(int(math.ceil(u)), n * m + 1)])
+  return float(atLeast) / total
+
+def formatTime(seconds):
+  for unit, scale in [('s', 1), ('ms', 1e-3), ('us', 1e-6)]:
+    if seconds >= scale: return '%.3f %s' % (seconds / scale, unit)
+  return '%.1f ns' % (seconds / 1e-9)
+
+def measure(benchmark, repeats=5, minTime=0.2):
+  """
+  Times a benchmark and returns its result: seconds per unit for each
+  repeat, their median and the matching throughput.
+  """
+  operation, count, timer = benchmark.setup()
+  clock = timeit.default_timer
+  start = clock()
+  operation()
+  calls = max(1, int(minTime / max(clock() - start, 1e-9)))
+  if timer != None: timer.histograms.clear()  # leave the warm-up out of the latencies
+
+  times = []
+  gcWasEnabled = gc.isenabled()
+  gc.collect()
+  gc.disable()
+  try:
+    for repeat in range(repeats):
+      start = clock()
+      for i in xrange(calls):
+        operation()
+      times.append((clock() - start) / (calls * count))
+  finally:
+    if gcWasEnabled: gc.enable()
+
+  result = {'unit': benchmark.unit,
+            'calls': calls,
+            'count': count,
+            'times': times,
+            'median': median(times),
+            'perSecond': 1.0 / median(times)}
+  if timer != None:
+    turns = timer.summary()['phases'].get('turn')
+    if turns: result['turn'] = turns['all']
+  return result
+
+def selectBenchmarks(patterns):
+  "Benchmarks whose names start with one of the comma-separated prefixes."
+  benchmarks = engineBenchmarks.allBenchmarks()
+  if not patterns: return benchmarks
+  prefixes = [p for p in patterns.split(',') if p]
+  return [b for b in benchmarks if [p for p in prefixes if b.name.startswith(p)]]
+
+def runBenchmarks(benchmarks, repeats=5, minTime=0.2, verbose=True):
+  results = {}
+  for benchmark in benchmarks:
+    result = measure(benchmark, repeats, minTime)
+    results[benchmark.name] = result
+    if verbose:
+      line = '%-36s %12s/%-5s %14.1f %s/s' % (benchmark.name, formatTime(result['median']), result['unit'],
+                                             result['perSecond'], result['unit'])
+      if 'turn' in result:
+        line += '   turn p50 %.3f ms, p95 %.3f ms' % (result['turn']['p50'], result['turn']['p95'])
+      print line
+      sys.stdout.flush()
+  return {'python': sys.version.split()[0],
+          'platform': platform.platform(),
+          'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+          'repeats': repeats,
+          'benchmarks': results}
+
+def loadResults(fileName):
+  with open(fileName) as f:
+    return json.load(f)
+
+def writeResults(results, fileName):
+  with open(fileName, 'w') as f:
+    json.dump(results, f, indent=2, sort_keys=True)
+
+def compare(old, new):
+  "A text table of the change in median time of every benchmark in both results."
+  lines = ['%-36s %14s %14s %9s' % ('benchmark', 'old', 'new', 'change')]
+  oldBenchmarks, newBenchmarks = old['benchmarks'], new['benchmarks']
+  for name in sorted(set(oldBenchmarks) | set(newBenchmarks)):
+    if name not in oldBenchmarks or name not in newBenchmarks:
+      lines.append('%-36s %s' % (name, 'only in ' + ['old', 'new'][name in newBenchmarks]))
+      continue
+    before, after = oldBenchmarks[name]['median'], newBenchmarks[name]['median']
+    change = 100.0 * (after - before) / before
+    verdict = ''
+    if change < -5: verdict = 'faster'
+    elif change > 5: verdict = 'slower'
+    lines.append('%-36s %14s %14s %+8.1f%% %s' % (name, formatTime(before), formatTime(after), change, verdict))
+  return '\n'.join(lines)
+
+def checkRegressions(baseline, results, threshold=10.0, alpha=0.05):
+  """
+  Compares results against a baseline and returns (report, regressions),
+  regressions being the names of the benchmarks that got slower.
+  """
+  lines = ['%-36s %14s %14s %9s %9s %8s' % ('benchmark', 'baseline', 'now', 'change', 'limit', 'p')]
+  regressions = []
+  for name in sorted(results['benchmarks']):
+    if name not in baseline['benchmarks']:
+      lines.append('%-36s not in the baseline' % name)
+      continue
+    old, new = baseline['benchmarks'][name], results['benchmarks'][name]
+    change = 100.0 * (new['median'] - old['median']) / old['median']
+    limit = max(threshold, 200.0 * max(relativeNoise(old['times']), relativeNoise(new['times'])))
+    p = mannWhitneyP(old['times'], new['times'])
+    verdict = ''
+    if change > limit and p < alpha:
+      verdict = 'REGRESSION'
+      regressions.append(name)
+    elif change < -limit and 1 - p < alpha:
+      verdict = 'improved'
+    lines.append('%-36s %14s %14s %+8.1f%% %8.1f%% %8.3f %s' % (name, formatTime(old['median']), formatTime(new['median']),
+                                                               change, limit, p, verdict))
+  if regressions:
+    lines += ['', '%d benchmark(s) regressed: %s' % (len(regressions), ', '.join(regressions))]
+  else:
+    lines += ['', 'No regressions.']
+  return '\n'.join(lines), regressions
+
+def readCommand(argv):
+  from optparse import OptionParser
+  parser = OptionParser(usage=__doc__)
+  parser.add_option('-b', '--benchmarks', default=None, metavar='PREFIXES',
+                    help='Only run benchmarks whose names start with one of these comma-separated prefixes')
+  parser.add_option('-o', '--output', default='benchmark-results.json', metavar='FILE',
+                    help='Where to write the results [Default: %default]')
+  parser.add_option('-r', '--repeats', type='int', default=5,
+                    help='Timed repeats per benchmark [Default: %default]')
+  parser.add_option('--minTime', type='float', default=0.2, metavar='SECONDS',
+                    help='Minimum duration of one repeat [Default: %default]')
+  parser.add_option('--list', action='store_true', default=False,
+                    help='List the benchmarks and exit')
+  parser.add_option('--compare', action='store_true', default=False,
+                    help='Compare two results files given as arguments instead of running')
+  parser.add_option('--check', default=None, metavar='BASELINE',
+                    help='Rerun the benchmarks in BASELINE and exit with status 1 if any regressed')
+  parser.add_option('--threshold', type='float', default=10.0, metavar='PERCENT',
+                    help='Smallest slowdown that --check reports [Default: %default]')
+  parser.add_option('--alpha', type='float', default=0.05,
+                    help='Significance level of --check [Default: %default]')
+  parser.add_option('--retries', type='int', default=2,
+                    help='Times --check measures a regressed benchmark again [Default: %default]')
+  options, otherjunk = parser.parse_args(argv)
+  if options.compare and len(otherjunk) != 2:
+    raise Exception('--compare takes two results files')
+  if not options.compare and otherjunk:
+    raise Exception('Command line input not understood: ' + str(otherjunk))
+  return options, otherjunk
+
+if __name__ == '__main__':
+  options, files = readCommand(sys.argv[1:])
+  if options.compare:
+    print compare(loadResults(files[0]), loadResults(files[1]))
+    sys.exit(0)
+
+  output = os.path.abspath(options.output)
+  baseline = None
+  if options.check:
+    baseline = loadResults(options.check)
+  os.chdir(ROOT)  # layouts and team files are found relative to the repository
+  benchmarks = selectBenchmarks(options.benchmarks)
+  if baseline != None:
+    benchmarks = [b for b in benchmarks if b.name in baseline['benchmarks']]
+  if options.list:
+    for benchmark in benchmarks: print benchmark.name
+    sys.exit(0)
+  results = runBenchmarks(benchmarks, options.repeats, options.minTime)
+  writeResults(results, output)
+  print 'Results written to %s' % output
+  if baseline != None:
+    report, regressions = checkRegressions(baseline, results, options.threshold, options.alpha)
+    for retry in range(options.retries):
+      if not regressions: break
+      print 'Measuring %d regressed benchmark(s) again' % len(regressions)
+      again = runBenchmarks([b for b in benchmarks if b.name in regressions], options.repeats, options.minTime)
+      results['benchmarks'].update(again['benchmarks'])
+      report, regressions = checkRegressions(baseline, results, options.threshold, options.alpha)
+    writeResults(results, output)
+    print
+    print report
+    if regressions: sys.exit(1)
@@ -0,0 +1,251 @@
+# bracket.py
+# ----------
+# Runs a seeded single-elimination tournament between capture teams, in the
+# format of the contest bracket (see bracket.png).
+
+"""
+Single-elimination bracket runner for capture the flag.
+
+Every match between two teams is one game per layout, with the teams
+swapping colors on alternate layouts.  All games of every match whose two
+teams are known are played at once on a pool of warm agent hosts (see
+agentHost.py), so a round takes as long as its slowest game rather than
+the sum of its games.
+A match is decided as soon as one team can no longer be caught, and its
+winner is moved into the next round straight away.  Games of a decided
+match that no host has started yet are dropped, and the results of those
+still running are ignored, so they do not delay the next round.
+
+Example:
+  python bracket.py -t baselineTeam,greymon,Risky,Greymon \\
+                    -l defaultCapture,alleyCapture,RANDOM13 --json bracket.json
+"""
+
+import sys, os, time, random
+import Queue
+import capture
+from agentHost import AgentHostPool
+
+class Match:
+  """
+  A match between two bracket slots.  The teams are filled in as the
+  earlier rounds are decided; a match with a single team is a bye.
+  """
+  def __init__(self, round, slot):
+    self.round = round
+    self.slot = slot
+    self.teams = [None, None]
+    self.seeds = [None, None]
+    self.games = []      # (layout, redTeam, blueTeam, score) in finishing order
+    self.wins = [0, 0]
+    self.pointDiff = 0   # from the point of view of teams[0]
+    self.numGames = 0
+    self.winner = None
+    self.started = None
+    self.decided = None
+
+  def isBye(self):
+    return self.teams.count(None) == 1 and self.numGames == 0 and self.winner != None
+
+  def addResult(self, gameIndex, layout, score):
+    "Records a finished game; score is from the red team's point of view."
+    first = gameIndex % 2  # index into self.teams of the red team
+    red, blue = self.teams[first], self.teams[1 - first]
+    self.games.append((layout, red, blue, score))
+    if first == 1: score = -score
+    self.pointDiff += score
+    if score > 0: self.wins[0] += 1
+    elif score < 0: self.wins[1] += 1
+
+  def checkDecided(self):
+    """
+    Returns the index of the winning team once the match can no longer
+    change hands, otherwise None.  Ties on wins go to the point
+    differential and then to the better seed.
+    """
+    remaining = self.numGames - len(self.games)
+    if self.wins[0] > self.wins[1] + remaining: return 0
+    if self.wins[1] > self.wins[0] + remaining: return 1
+    if remaining > 0: return None
+    if self.wins[0] != self.wins[1]: return int(self.wins[1] > self.wins[0])
+    if self.pointDiff != 0: return int(self.pointDiff < 0)
+    return int(self.seeds[1] < self.seeds[0])
+
+  def toDict(self):
+    return {'round': self.round, 'slot': self.slot,
+            'teams': self.teams, 'seeds': self.seeds,
+            'wins': self.wins, 'pointDiff': self.pointDiff,
+            'winner': self.winner, 'bye': self.isBye(),
+            'seconds': None if self.started == None else round(self.decided - self.started, 2),
+            'games': [{'layout': l, 'red': r, 'blue': b, 'score': s} for l, r, b, s in self.games]}
+
+def seedOrder(size):
+  """
+  Returns the seed numbers (starting at 1) in bracket order for a bracket
+  of the given power-of-two size, so that 1 meets 2 only in the final.
+  """
+  order = [1]
+  while len(order) < size:
+    n = 2 * len(order) + 1
+    order = sum([[s, n - s] for s in order], [])
+  return order
+
+def teamName(team):
+  return os.path.splitext(os.path.basename(team))[0]
+
+class Bracket:
+  """
+  Plays a single-elimination bracket.  teams are team files in seed order
+  (best first); every match plays one game on each layout.
+  """
+  def __init__(self, teams, layouts, length=1200, numWorkers=None, catchExceptions=True):
+    if len(teams) < 2: raise Exception('A bracket needs at least two teams')
+    self.teams = teams
+    self.layouts = layouts
+    self.length = length
+    self.catchExceptions = catchExceptions
+    self.numWorkers = numWorkers
+
+    size = 1
+    while size < len(teams): size *= 2
+    self.rounds = []
+    numMatches = size / 2
+    while numMatches >= 1:
+      self.rounds.append([Match(len(self.rounds), slot) for slot in range(numMatches)])
+      numMatches /= 2
+
+    # Seed the first round; missing seeds are byes for their opponents
+    order = seedOrder(size)
+    for slot, match in enumerate(self.rounds[0]):
+      for side in range(2):
+        seed = order[2 * slot + side]
+        if seed <= len(teams):
+          match.teams[side] = teams[seed - 1]
+          match.seeds[side] = seed
+
+  def run(self):
+    "Plays every match and returns the champion's team file."
+    self.started = time.time()
+    self.results = Queue.Queue()
+    self.pool = AgentHostPool(self.numWorkers)
+    try:
+      for match in self.rounds[0]:
+        self._start(match)
+      while self.champion() == None:
+        key, score, error = self.results.get()
+        roundIndex, slot, gameIndex = key
+        match = self.rounds[roundIndex][slot]
+        if match.winner != None: continue  # already decided
+        if error != None:
+          print >>sys.stderr, 'Game %d of match %s failed: %s' % (gameIndex, ' vs '.join(map(teamName, match.teams)), error)
+        match.addResult(gameIndex, self.layouts[gameIndex], score)
+        winner = match.checkDecided()
+        if winner != None:
+          self._decide(match, winner)
+    finally:
+      self.pool.terminate()
+    self.elapsed = time.time() - self.started
+    return self.champion()
+
+  def _start(self, match):
+    """
+    Schedules the games of a match whose teams are known, resolving byes
+    on the spot.
+    """
+    if None in match.teams:
+      self._decide(match, 1 - match.teams.index(None))
+      return
+    match.started = time.time()
+    match.numGames = len(self.layouts)
+    for gameIndex, layout in enumerate(self.layouts):
+      red, blue = match.teams[gameIndex % 2], match.teams[1 - gameIndex % 2]
+      key = (match.round, match.slot, gameIndex)
+      seed = random.randint(0, 99999999)
+      self.pool.playGame(key, red, blue, layout, self.length, self.catchExceptions, seed,
+                         callback=self.results.put, cancelled=lambda: match.winner != None)
+    print 'Round %d: %s vs %s started' % (match.round + 1, teamName(match.teams[0]), teamName(match.teams[1]))
+
+  def _decide(self, match, winner):
+    "Advances the winner of a match and starts the next match if it is ready."
+    match.winner = match.teams[winner]
+    match.decided = time.time()
+    if match.numGames > 0:
+      pointDiff = match.pointDiff if winner == 0 else -match.pointDiff
+      print 'Round %d: %s beats %s (%d-%d, %+d points)' % (match.round + 1, teamName(match.winner),
+             teamName(match.teams[1 - winner]), match.wins[winner], match.wins[1 - winner], pointDiff)
+    if match.round + 1 == len(self.rounds):
+      return
+    nextMatch = self.rounds[match.round + 1][match.slot / 2]
+    nextMatch.teams[match.slot % 2] = match.winner
+    nextMatch.seeds[match.slot % 2] = match.seeds[winner]
+    if self._feedersDecided(nextMatch):
+      self._start(nextMatch)
+
+  def _feedersDecided(self, match):
+    previous = self.rounds[match.round - 1]
+    return previous[2 * match.slot].winner != None and previous[2 * match.slot + 1].winner != None
+
+  def champion(self):
+    return self.rounds[-1][0].winner
+
+  def toDict(self):
+    return {'teams': self.teams, 'layouts': self.layouts, 'length': self.length,
+            'champion': self.champion(), 'seconds': round(self.elapsed, 2),
+            'rounds': [[match.toDict() for match in matches] for matches in self.rounds]}
+
+  def writeJSON(self, fileName):
+    import json
+    with open(fileName, 'w') as f:
+      json.dump(self.toDict(), f, indent=2)
+
+  def writeHTML(self, fileName):
+    from cgi import escape
+    html = ['<html>\n<head>\n<title>Capture the Flag Bracket</title>',
+            '<link href="projects.css" rel="stylesheet" type="text/css">',
+            '<style type="text/css">td { padding: 2px 10px; } .winner { font-weight: bold }</style>',
+            '</head>\n<body>\n<h2>Capture the Flag Bracket</h2>',
+            '<p>Champion: <b>%s</b></p>' % escape(teamName(self.champion() or ''))]
+    for matches in self.rounds:
+      title = 'Final' if matches is self.rounds[-1] else 'Round %d' % (matches[0].round + 1)
+      html.append('<h3>%s</h3>\n<table>' % title)
+      for match in matches:
+        cells = []
+        for side in range(2):
+          team = match.teams[side]
+          if team == None:
+            cells.append('<td>(bye)</td>')
+            continue
+          style = ' class="winner"' if team == match.winner else ''
+          cells.append('<td%s>(%d) %s</td><td>%d</td>' % (style, match.seeds[side], escape(teamName(team)), match.wins[side]))
+        games = ', '.join(['%s %s' % (escape(l), s) for l, r, b, s in match.games])
+        html.append('<tr>%s<td>%s</td></tr>' % (' <td>vs</td> '.join(cells), games))
+      html.append('</table>')
+    html.append('</body>\n</html>\n')
+    with open(fileName, 'w') as f:
+      f.write('\n'.join(html))
+
+def readCommand(argv):
+  from optparse import OptionParser
+  parser = OptionParser('python bracket.py -t TEAM1,TEAM2,... [options]')
+  parser.add_option('-t', '--teams', help='Comma separated team files in seed order (best first)')
+  parser.add_option('-l', '--layouts', help=capture.default('Comma separated layouts played in every match'),
+                    default='defaultCapture,alleyCapture,RANDOM')
+  parser.add_option('-i', '--time', type='int', help=capture.default('TIME limit of a game in moves'), default=1200)
+  parser.add_option('-j', '--workers', type='int', help='Number of agent host processes [Default: number of CPUs]', default=None)
+  parser.add_option('--shuffle', action='store_true', help='Seed the teams in a random order', default=False)
+  parser.add_option('--json', help=capture.default('Write the bracket results as JSON'), default='bracket.json')
+  parser.add_option('--html', help=capture.default('Write the bracket results as HTML'), default='bracket.html')
+  options, otherjunk = parser.parse_args(argv)
+  assert len(otherjunk) == 0, "Unrecognized options: " + str(otherjunk)
+  if not options.teams: parser.error('no teams given')
+  teams = options.teams.split(',')
+  if options.shuffle: random.shuffle(teams)
+  return options, teams, options.layouts.split(',')
+
+if __name__ == '__main__':
+  options, teams, layouts = readCommand(sys.argv[1:])
+  bracket = Bracket(teams, layouts, options.time, options.workers)
+  champion = bracket.run()
+  print 'Champion: %s (%.1f seconds)' % (teamName(champion), bracket.elapsed)
+  if options.json: bracket.writeJSON(options.json)
+  if options.html: bracket.writeHTML(options.html)
@@ -57,8 +57,9 @@ from util import manhattanDistance
 from game import Grid
 from game import Configuration
 from game import Agent
+from game import AgentState
 from game import reconstituteGrid
-import sys, util, types, time, random, imp
+import sys, os, util, types, time, random, imp
 import keyboardAgents
 
 # If you change these, you won't affect the server, so you can't cheat
@@ -210,10 +211,7 @@ class GameState:
     """
     Returns a noisy distance to each agent.
     """
-    if 'agentDistances' in dir(self) :
-      return self.agentDistances
-    else:
-      return None
+    return getattr(self, 'agentDistances', None)
 
   def getDistanceProb(self, trueDistance, noisyDistance):
     "Returns the probability of a noisy distance given the true distance"
@@ -328,6 +326,58 @@ class GameState:
     else:
       return configOrPos.pos[0] < width / 2
 
+def packGameState(state, foodBits=None):
+  """
+  Returns a compact, marshal-friendly tuple holding everything in a
+  GameState except its layout, which the receiver is expected to have.
+  Callers that already have the packBits of the state's food can pass them
+  as foodBits.
+  """
+  data = state.data
+  agents = tuple([(a.start.pos, a.start.direction,
+                   a.configuration and a.configuration.pos,
+                   a.configuration and a.configuration.direction,
+                   a.isPacman, a.scaredTimer, a.numCarrying, a.numReturned)
+                  for a in data.agentStates])
+  if foodBits == None: foodBits = data.food.packBits()
+  return (foodBits, tuple(data.capsules), agents, data.score, data.timeleft,
+          tuple(state.agentDistances), tuple(state.redTeam), tuple(state.blueTeam), tuple(state.teams),
+          data._agentMoved, data._foodEaten, data._foodAdded and tuple(data._foodAdded),
+          data._capsuleEaten, data._win, data._lose)
+
+def unpackGameState(packed, layout):
+  "Rebuilds the GameState packed by packGameState on the given layout."
+  (food, capsules, agents, score, timeleft, distances, redTeam, blueTeam, teams,
+   agentMoved, foodEaten, foodAdded, capsuleEaten, win, lose) = packed
+  state = GameState()
+  data = state.data
+  data.layout = layout
+  data.food = reconstituteGrid(food)
+  data.capsules = list(capsules)
+  data.agentStates = []
+  for startPos, startDir, pos, direction, isPacman, scared, carrying, returned in agents:
+    agentState = AgentState(Configuration(startPos, startDir), isPacman)
+    if pos != None: agentState.configuration = Configuration(pos, direction)
+    else: agentState.configuration = None
+    agentState.scaredTimer = scared
+    agentState.numCarrying = carrying
+    agentState.numReturned = returned
+    data.agentStates.append(agentState)
+  data._eaten = [False for a in data.agentStates]
+  data.score = score
+  data.timeleft = timeleft
+  data._agentMoved = agentMoved
+  data._foodEaten = foodEaten
+  data._foodAdded = foodAdded and list(foodAdded)
+  data._capsuleEaten = capsuleEaten
+  data._win = win
+  data._lose = lose
+  state.agentDistances = list(distances)
+  state.redTeam = list(redTeam)
+  state.blueTeam = list(blueTeam)
+  state.teams = list(teams)
+  return state
+
 def halfGrid(grid, red):
   halfway = grid.width / 2
   halfgrid = Grid(grid.width, grid.height, False)
@@ -365,17 +415,15 @@ class CaptureRules:
   def __init__(self, quiet = False):
     self.quiet = quiet
 
-  def newGame( self, layout, agents, display, length, muteAgents, catchExceptions ):
+  def newGame( self, layout, agents, display, length, muteAgents, catchExceptions, training=False ):
     initState = GameState()
     initState.initialize( layout, len(agents) )
     starter = random.randint(0,1)
-    print('%s team starts' % ['Red', 'Blue'][starter])
-    game = Game(agents, display, self, startingIndex=starter, muteAgents=muteAgents, catchExceptions=catchExceptions)
+    if not training: print('%s team starts' % ['Red', 'Blue'][starter])
+    game = Game(agents, display, self, startingIndex=starter, muteAgents=muteAgents, catchExceptions=catchExceptions, training=training)
     game.state = initState
     game.length = length
     game.state.data.timeleft = length
-    if 'drawCenterLine' in dir(display):
-      display.drawCenterLine()
     self._initBlueFood = initState.getBlueFood().count()
     self._initRedFood = initState.getRedFood().count()
     return game
@@ -384,9 +432,8 @@ class CaptureRules:
     """
     Checks to see whether it is time to end the game.
     """
-    if 'moveHistory' in dir(game):
-      if len(game.moveHistory) == game.length:
-        state.data._win = True
+    if game.numMoves == game.length:
+      state.data._win = True
 
     if state.isOver():
       game.gameOver = True
@@ -416,7 +463,7 @@ class CaptureRules:
   def getProgress(self, game):
     blue = 1.0 - (game.state.getBlueFood().count() / float(self._initBlueFood))
     red = 1.0 - (game.state.getRedFood().count() / float(self._initRedFood))
-    moves = len(self.moveHistory) / float(game.length)
+    moves = game.numMoves / float(game.length)
 
     # return the most likely progress indicator, clamped to [0, 1]
     return min(max(0.75 * max(red, blue) + 0.25 * moves, 0.0), 1.0)
@@ -783,6 +830,8 @@ def readCommand( argv ):
   parser.add_option('-l', '--layout', dest='layout',
                     help=default('the LAYOUT_FILE from which to load the map layout; use RANDOM for a random maze; use RANDOM<seed> to use a specified random seed, e.g., RANDOM23'),
                     metavar='LAYOUT_FILE', default='defaultCapture')
+  parser.add_option('--layoutArchive', default=None, metavar='FILE',
+                    help='Also find layouts, including RANDOM<seed> mazes, in this layout archive (see generateTournamentLayouts.py)')
   parser.add_option('-t', '--textgraphics', action='store_true', dest='textgraphics',
                     help='Display output as text only', default=False)
 
@@ -794,6 +843,8 @@ def readCommand( argv ):
 
   parser.add_option('-z', '--zoom', type='float', dest='zoom',
                     help=default('Zoom in the graphics'), default=1)
+  parser.add_option('--fps', type='float', default=0,
+                    help='Draw the graphics on a separate thread at up to FPS frames per second, dropping frames it cannot keep up with (0 draws every move in the game loop)')
   parser.add_option('-i', '--time', type='int', dest='time',
                     help=default('TIME limit of a game in moves'), default=1200, metavar='TIME')
   parser.add_option('-n', '--numGames', type='int',
@@ -801,13 +852,35 @@ def readCommand( argv ):
   parser.add_option('-f', '--fixRandomSeed', action='store_true',
                     help='Fixes the random seed to always play the same game', default=False)
   parser.add_option('--record', action='store_true',
-                    help='Writes game histories to a file (named by the time they were played)', default=False)
+                    help='Writes each game to a replay file, replay-N for the Nth game', default=False)
+  parser.add_option('--recordDir', default='.', metavar='DIR',
+                    help=default('Directory the replay files of --record are written to'))
   parser.add_option('--replay', default=None,
                     help='Replays a recorded game file.')
+  parser.add_option('--replayStart', type='int', default=0, metavar='MOVE',
+                    help=default('Move to start a replay from'))
   parser.add_option('-x', '--numTraining', dest='numTraining', type='int',
                     help=default('How many episodes are training (suppresses output)'), default=0)
   parser.add_option('-c', '--catchExceptions', action='store_true', default=False,
                     help='Catch exceptions and enforce time limits')
+  parser.add_option('--timing', default=None, metavar='FILE',
+                    help='Time each phase of the game loop and write p50/p95/p99/max per phase and agent to FILE as JSON')
+  parser.add_option('--eventLog', default=None, metavar='FILE',
+                    help='Write every move and game event to FILE as JSON lines (see eventLog.py)')
+  parser.add_option('--observer', action='append', default=[], metavar='MODULE.CLASS[:OPTS]',
+                    help='Attach a game.GameObserver to every game, e.g. myStats.LiveStats:every=10 (may be repeated)')
+  parser.add_option('--profile-agent', type='int', dest='profileAgent', default=None, metavar='INDEX',
+                    help='Profile the registerInitialState and getAction calls of agent INDEX with cProfile')
+  parser.add_option('--profile-output', dest='profileOutput', default=None, metavar='PREFIX',
+                    help='Write the agent profile to PREFIX.pstats and PREFIX.collapsed [Default: agentINDEX-profile]')
+  parser.add_option('--sample-profile', dest='sampleProfile', default=None, metavar='FILE',
+                    help='Run a low-overhead sampling profiler over all games and write its report to FILE')
+  parser.add_option('--sample-interval', dest='sampleInterval', type='float', default=5, metavar='MS',
+                    help=default('CPU milliseconds between samples of the sampling profiler'))
+  parser.add_option('--sandbox', action='store_true', default=False,
+                    help='Run each agent in its own process (time limits are enforced with -c)')
+  parser.add_option('--sandboxMemory', type='int', default=0, metavar='MB',
+                    help='Address space limit for each sandboxed agent process in MB (0 for none)')
 
   options, otherjunk = parser.parse_args(argv)
   assert len(otherjunk) == 0, "Unrecognized options: " + str(otherjunk)
@@ -844,12 +917,21 @@ def readCommand( argv ):
   # Special case: recorded games don't use the runGames method or args structure
   if options.replay != None:
     print 'Replaying recorded game %s.' % options.replay
-    import cPickle
-    recorded = cPickle.load(open(options.replay))
-    recorded['display'] = args['display']
-    replayGame(**recorded)
+    import replay
+    recorded = replay.readReplay(options.replay)
+    if not recorded.complete:
+      print 'The recording ends before the game did.'
+    replayGame(recorded.layout, recorded.agents(), recorded.actions[options.replayStart:], args['display'], recorded.length,
+               recorded.redTeamName, recorded.blueTeamName, recorded.stateAt(options.replayStart))
     sys.exit(0)
 
+  if options.fps > 0 and not (options.textgraphics or options.quiet or options.super_quiet):
+    if options.keys0 or options.keys1 or options.keys2 or options.keys3:
+      raise Exception('Keyboard agents cannot be used with --fps')
+    import captureGraphicsDisplay, __main__
+    args['display'] = captureGraphicsDisplay.ThreadedDisplay(args['display'], options.fps)
+    __main__.__dict__['_display'] = args['display']
+
   # Choose a pacman agent
   redArgs, blueArgs = parseAgentArgs(options.redOpts), parseAgentArgs(options.blueOpts)
   if options.numTraining > 0:
@@ -874,32 +956,90 @@ def readCommand( argv ):
     numKeyboardAgents += 1
     args['agents'][index] = agent
 
+  if options.profileAgent != None:
+    import agentProfiler
+    if options.sandbox:
+      raise Exception('--profile-agent cannot profile a sandboxed agent')
+    if args['agents'][options.profileAgent] == None:
+      raise Exception('Agent %d failed to load and cannot be profiled' % options.profileAgent)
+    args['profiler'] = agentProfiler.AgentProfiler(options.profileAgent, options.profileOutput)
+    args['profiler'].attach(args['agents'][options.profileAgent])
+
+  if options.sampleProfile:
+    import samplingProfiler
+    args['sampler'] = samplingProfiler.SamplingProfiler(options.sampleInterval / 1000.0, options.sampleProfile)
+    args['sampler'].registerAgents(args['agents'])
+
+  if options.sandbox:
+    import agentSandbox
+    rules = CaptureRules()
+    for index, agent in enumerate(args['agents']):
+      if agent == None or isinstance(agent, keyboardAgents.KeyboardAgent): continue
+      timeouts = (None, None)
+      if options.catchExceptions:
+        timeouts = (rules.getMaxStartupTime(index), rules.getMoveTimeout(index))
+      args['agents'][index] = agentSandbox.SandboxedAgent(agent, options.super_quiet, memoryLimit=options.sandboxMemory * 1024 * 1024,
+                                                          startupTimeout=timeouts[0], moveTimeout=timeouts[1])
+
   # Choose a layout
-  import layout
+  if options.layoutArchive:
+    import layout
+    layout.REGISTRY.addArchive(options.layoutArchive)
   layouts = []
   for i in range(options.numGames):
-    if options.layout == 'RANDOM':
-      l = layout.Layout(randomLayout().split('\n'))
-    elif options.layout.startswith('RANDOM'):
-      l = layout.Layout(randomLayout(int(options.layout[6:])).split('\n'))
-    elif options.layout.lower().find('capture') == -1:
-      raise Exception( 'You must use a capture layout with capture.py')
-    else:
-      l = layout.getLayout( options.layout )
-    if l == None: raise Exception("The layout " + options.layout + " cannot be found")
-    
-    layouts.append(l)
-    
+    layouts.append(loadLayout(options.layout))
+
   args['layouts'] = layouts
   args['length'] = options.time
   args['numGames'] = options.numGames
   args['numTraining'] = options.numTraining
   args['record'] = options.record
+  args['recordDir'] = options.recordDir
+  if options.fixRandomSeed: args['seed'] = 'cs188'
   args['catchExceptions'] = options.catchExceptions
+  if options.timing:
+    import phaseTimer
+    args['timer'] = phaseTimer.PhaseTimer(options.timing)
+  args['observers'] = [loadObserver(spec) for spec in options.observer]
+  if options.eventLog:
+    import eventLog
+    args['observers'].append(eventLog.EventLogger(options.eventLog))
   return args
 
+def loadObserver(spec):
+  """
+  Creates the GameObserver named by a command line spec of the form
+  module.Class or module.Class:key=value,key=value.
+  """
+  name, opts = spec, ''
+  if ':' in spec:
+    name, opts = spec.split(':', 1)
+  if '.' not in name:
+    raise Exception('Observers are given as module.Class, not ' + name)
+  moduleName, className = name.rsplit('.', 1)
+  module = __import__(moduleName)
+  return getattr(module, className)(**parseAgentArgs(opts))
+
+def loadLayout(name):
+  """
+  Returns the capture Layout for a command line layout name, which may be
+  RANDOM or RANDOM<seed> for a generated maze.
+  """
+  import layout
+  if name == 'RANDOM':
+    l = layout.Layout(randomLayout().split('\n'))
+  elif name.startswith('RANDOM'):
+    seed = int(name[6:])
+    l = layout.REGISTRY.findSeed(seed) or layout.REGISTRY.fromText(randomLayout(seed))
+  elif name.lower().find('capture') == -1:
+    raise Exception( 'You must use a capture layout with capture.py')
+  else:
+    l = layout.getLayout( name )
+  if l == None: raise Exception("The layout " + name + " cannot be found")
+  return l
+
 def randomLayout(seed = None):
-  if not seed:
+  if seed is None:
     seed = random.randint(0,99999999)
   # layout = 'layouts/random%08dCapture.lay' % seed
   # print 'Generating random layout in %s' % layout
@@ -907,13 +1047,31 @@ def randomLayout(seed = None):
   return mazeGenerator.generateMaze(seed)
 
 import traceback
-def loadAgents(isRed, factory, textgraphics, cmdLineArgs):
-  "Calls agent factories and returns lists of agents"
+def loadAgents(isRed, factory, textgraphics, cmdLineArgs, moduleCache=None):
+  """
+  Calls agent factories and returns lists of agents.  If a moduleCache dict
+  is given, each team file is read and compiled once and the code is kept
+  in it.  The code is still run into a fresh module for every call, under
+  the same per-colour name as without a cache, so module-level state such
+  as a list of the team's agents is never shared between the two colours
+  or carried from one game to the next; only the modules a team imports
+  (distanceCalculator, say) stay warm.
+  """
   try:
     if not factory.endswith(".py"):
       factory += ".py"
 
-    module = imp.load_source('player' + str(int(isRed)), factory)
+    if moduleCache == None:
+      module = imp.load_source('player' + str(int(isRed)), factory)
+    else:
+      path = os.path.abspath(factory)
+      if path not in moduleCache:
+        with open(path) as f:
+          moduleCache[path] = compile(f.read(), path, 'exec')
+      module = imp.new_module('player' + str(int(isRed)))
+      module.__file__ = path
+      sys.modules[module.__name__] = module
+      exec moduleCache[path] in module.__dict__
   except (NameError, ImportError):
     print >>sys.stderr, 'Error: The team "' + factory + '" could not be loaded! '
     traceback.print_exc()
@@ -941,17 +1099,24 @@ def loadAgents(isRed, factory, textgraphics, cmdLineArgs):
   indices = [2*i + indexAddend for i in range(2)]
   return createTeamFunc(indices[0], indices[1], isRed, **args)
 
-def replayGame( layout, agents, actions, display, length, redTeamName, blueTeamName ):
+def replayGame( layout, agents, actions, display, length, redTeamName, blueTeamName, startState=None ):
     rules = CaptureRules()
     game = rules.newGame( layout, agents, display, length, False, False )
+    if startState != None: game.state = startState
     state = game.state
     display.redTeam = redTeamName
     display.blueTeam = blueTeamName
     display.initialize(state.data)
 
-    for action in actions:
+    for agentIndex, action in actions:
+      if action == None:
+        # The agent crashed or ran out of time
+        game.state = state
+        rules.agentCrash(game, agentIndex)
+        display.update( state.data )
+        continue
       # Execute the action
-      state = state.generateSuccessor( *action )
+      state = state.generateSuccessor( agentIndex, action )
       # Change the display
       display.update( state.data )
       # Allow for game specific conditions (winning, losing, etc.)
@@ -959,7 +1124,7 @@ def replayGame( layout, agents, actions, display, length, redTeamName, blueTeamN
 
     display.finish()
 
-def runGames( layouts, agents, display, length, numGames, record, numTraining, redTeamName, blueTeamName, muteAgents=False, catchExceptions=False ):
+def runGames( layouts, agents, display, length, numGames, record, numTraining, redTeamName, blueTeamName, muteAgents=False, catchExceptions=False, timer=None, observers=(), profiler=None, sampler=None, recordDir='.', seed=None ):
 
   rules = CaptureRules()
   games = []
@@ -967,32 +1132,41 @@ def runGames( layouts, agents, display, length, numGames, record, numTraining, r
   if numTraining > 0:
     print 'Playing %d training games' % numTraining
 
-  for i in range( numGames ):
-    beQuiet = i < numTraining
-    layout = layouts[i]
-    if beQuiet:
-        # Suppress output and graphics
-        import textDisplay
-        gameDisplay = textDisplay.NullGraphics()
-        rules.quiet = True
-    else:
-        gameDisplay = display
-        rules.quiet = False
-    g = rules.newGame( layout, agents, gameDisplay, length, muteAgents, catchExceptions )
-    g.run()
-    if not beQuiet: games.append(g)
-
-    g.record = None
-    if record:
-      import time, cPickle, game
-      #fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
-      #f = file(fname, 'w')
-      components = {'layout': layout, 'agents': [game.Agent() for a in agents], 'actions': g.moveHistory, 'length': length, 'redTeamName': redTeamName, 'blueTeamName':blueTeamName }
-      #f.close()
-      print "recorded"
-      g.record = cPickle.dumps(components)
-      with open('replay-%d'%i,'wb') as f:
-        f.write(g.record)
+  if sampler != None: sampler.start()
+  try:
+    for i in range( numGames ):
+      beQuiet = i < numTraining
+      layout = layouts[i]
+      if beQuiet:
+          # Suppress output and graphics
+          import textDisplay
+          gameDisplay = textDisplay.NullGraphics()
+          rules.quiet = True
+      else:
+          gameDisplay = display
+          rules.quiet = False
+      g = rules.newGame( layout, agents, gameDisplay, length, muteAgents, catchExceptions, training=beQuiet )
+      g.timer = timer
+      for observer in observers: g.addObserver(observer)
+      g.record = None
+      if record:
+        import replay
+        g.record = os.path.join(recordDir, 'replay-%d' % i)
+        g.addObserver(replay.ReplayWriter(g.record, layout, redTeamName, blueTeamName, seed))
+      g.run()
+      if timer != None: timer.gameEnded()
+      if not beQuiet: games.append(g)
+      if record: print 'Game recorded to %s' % g.record
+  finally:
+    # Disarm SIGPROF and keep the samples even if a game raised or was interrupted
+    if sampler != None:
+      sampler.stop()
+      sampler.write()
+      print 'Sampling profile (%d samples) written to %s' % (sampler.samples, sampler.fileName)
+    # Sandboxed agents keep a child process across games; stop them
+    for agent in agents:
+      shutdown = getattr(agent, 'shutdown', None)
+      if shutdown != None: shutdown()
 
   if numGames > 1:
     scores = [game.state.data.score for game in games]
@@ -1003,8 +1177,36 @@ def runGames( layouts, agents, display, length, numGames, record, numTraining, r
     print 'Red Win Rate:  %d/%d (%.2f)' % ([s > 0 for s in scores].count(True), len(scores), redWinRate)
     print 'Blue Win Rate: %d/%d (%.2f)' % ([s < 0 for s in scores].count(True), len(scores), blueWinRate)
     print 'Record:       ', ', '.join([('Blue', 'Tie', 'Red')[max(0, min(2, 1 + s))] for s in scores])
+
+  if timer != None:
+    print timer.report()
+    timer.write()
+    print 'Phase timings written to %s' % timer.fileName
+  if profiler != None:
+    print 'Profile of agent %d (%d calls) written to %s and %s' % ((profiler.agentIndex, profiler.calls) + profiler.write())
   return games
 
+def runHeadlessGame(red, blue, layoutName, length=1200, redOpts='', blueOpts='', catchExceptions=True, seed=None, moduleCache=None):
+  """
+  Plays one game between two team files with no display and all output
+  muted, and returns the final score (positive if red won).  This is what
+  the tournament tools run inside their worker processes; they pass a seed
+  per game because forked workers would otherwise share one random state.
+  """
+  import textDisplay
+  if seed != None: random.seed(seed)
+  util.mutePrint()
+  try:
+    redAgents = loadAgents(True, red, True, parseAgentArgs(redOpts), moduleCache)
+    blueAgents = loadAgents(False, blue, True, parseAgentArgs(blueOpts), moduleCache)
+    agents = sum([list(el) for el in zip(redAgents, blueAgents)],[])
+    rules = CaptureRules(quiet=True)
+    g = rules.newGame( loadLayout(layoutName), agents, textDisplay.NullGraphics(), length, True, catchExceptions )
+    g.run()
+    return g.state.data.score
+  finally:
+    util.unmutePrint()
+
 def save_score(game):
     with open('score', 'w') as f:
         print >>f, game.state.data.score
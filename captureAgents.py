@@ -20,6 +20,10 @@ from game import Agent
 import distanceCalculator
 from util import nearestPoint
 import util
+import collections
+
+# Observations a CaptureAgent keeps as full GameStates; older ones are packed
+RECENT_OBSERVATIONS = 10
 
 # Note: the following class is not used, but is kept for backwards
 # compatibility with team submissions that try to import it.
@@ -33,6 +37,70 @@ class AgentFactory:
     "Returns the agent for the provided index."
     util.raiseNotDefined()
 
+class ObservationHistory:
+  """
+  The GameStates an agent has observed, oldest first.  It can be used like
+  the list it replaces: append, len, indexing (negative indices and slices
+  included) and iteration work the same.
+
+  Only the last `recent` states are kept as they are.  Older ones are
+  stored as capture.packGameState tuples, and every field of a tuple that
+  did not change since the state before it shares that state's object.
+  So an old observation costs a few hundred bytes rather than a full copy
+  of the board, and it is unpacked again only if it is read.  With a
+  `limit`, only the last `limit` states are kept at all.
+  """
+  def __init__(self, recent=RECENT_OBSERVATIONS, limit=None):
+    self.recent = max(1, recent)
+    self.limit = limit
+    self.packed = collections.deque()
+    self.states = collections.deque()
+    self.layout = None
+    self.lastPacked = None
+    self.lastFood = None
+
+  def append(self, state):
+    self.states.append(state)
+    if len(self.states) > self.recent:
+      self.pack(self.states.popleft())
+    if self.limit != None:
+      while len(self) > self.limit:
+        if self.packed: self.packed.popleft()
+        else: self.states.popleft()
+
+  def pack(self, state):
+    import capture
+    food = state.data.food
+    foodBits = None
+    if self.lastFood != None and food.data == self.lastFood.data:
+      foodBits = self.lastPacked[0]
+    packed = capture.packGameState(state, foodBits)
+    last = self.lastPacked
+    if last != None:
+      agents = tuple([new == old and old or new for new, old in zip(packed[2], last[2])])
+      packed = tuple([new == old and old or new for new, old in zip(packed, last)])
+      packed = packed[:2] + (agents,) + packed[3:]
+    self.packed.append(packed)
+    self.lastPacked = packed
+    self.lastFood = food
+    self.layout = state.data.layout
+
+  def __len__(self):
+    return len(self.packed) + len(self.states)
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return [self[i] for i in range(*index.indices(len(self)))]
+    if index < 0: index += len(self)
+    if index < 0 or index >= len(self): raise IndexError('observation index out of range')
+    if index >= len(self.packed): return self.states[index - len(self.packed)]
+    import capture
+    return capture.unpackGameState(self.packed[index], self.layout)
+
+  def __iter__(self):
+    for i in range(len(self)):
+      yield self[i]
+
 class RandomAgent( Agent ):
   """
   A random agent that abides by the rules.
@@ -62,10 +130,12 @@ class CaptureAgent(Agent):
     self.red = true if you're on the red team, false otherwise
     self.agentsOnTeam = a list of agent objects that make up your team
     self.distancer = distance calculator (contest code provides this)
-    self.observationHistory = list of GameState objects that correspond
-        to the sequential order of states that have occurred so far this game
+    self.observationHistory = the GameState objects that correspond to the sequential
+        order of states that have occurred so far this game (an ObservationHistory)
     self.timeForComputing = an amount of time to give each turn for computing maze distances
         (part of the provided distance calculator)
+    self.moveDeadline = a util.Deadline for the current registerInitialState or move;
+        self.moveDeadline.timeRemaining() is the time left before the move is forfeit
     """
     # Agent index for querying state
     self.index = index
@@ -80,7 +150,7 @@ class CaptureAgent(Agent):
     self.distancer = None
 
     # A history of observations
-    self.observationHistory = []
+    self.observationHistory = ObservationHistory()
 
     # Time to spend each turn on computing maze distances
     self.timeForComputing = timeForComputing
@@ -88,6 +158,9 @@ class CaptureAgent(Agent):
     # Access to the graphics
     self.display = None
 
+    # Time limit of the current call (a util.Deadline), set by the game
+    self.moveDeadline = None
+
   def registerInitialState(self, gameState):
     """
     This method handles the initial setup of the
@@ -109,7 +182,16 @@ class CaptureAgent(Agent):
       self.display = __main__._display
 
   def final(self, gameState):
-    self.observationHistory = []
+    history = self.observationHistory
+    self.observationHistory = ObservationHistory(getattr(history, 'recent', RECENT_OBSERVATIONS),
+                                                 getattr(history, 'limit', None))
+
+  def setMoveDeadline(self, deadline):
+    """
+    Called by the game before registerInitialState and before each move
+    with the util.Deadline of that call.
+    """
+    self.moveDeadline = deadline
 
   def registerTeam(self, agentsOnTeam):
     """
@@ -124,18 +206,16 @@ class CaptureAgent(Agent):
 
   def debugDraw(self, cells, color, clear=False):
 
-    if self.display:
-      from captureGraphicsDisplay import PacmanGraphics
-      if isinstance(self.display, PacmanGraphics):
-        if not type(cells) is list:
-          cells = [cells]
-        self.display.debugDraw(cells, color, clear)
+    debugDraw = getattr(self.display, 'debugDraw', None)
+    if debugDraw != None:
+      if not type(cells) is list:
+        cells = [cells]
+      debugDraw(cells, color, clear)
 
   def debugClear(self):
-    if self.display:
-      from captureGraphicsDisplay import PacmanGraphics
-      if isinstance(self.display, PacmanGraphics):
-        self.display.clearDebug()
+    clearDebug = getattr(self.display, 'clearDebug', None)
+    if clearDebug != None:
+      clearDebug()
 
   #################
   # Action Choice #
@@ -284,8 +364,9 @@ class CaptureAgent(Agent):
         dists.append(dist)
       else:
         dists.append(util.Counter())
-    if self.display != None and 'updateDistributions' in dir(self.display):
-      self.display.updateDistributions(dists)
+    updateDistributions = getattr(self.display, 'updateDistributions', None)
+    if updateDistributions != None:
+      updateDistributions(dists)
     else:
       self._distributions = dists # These can be read by pacclient.py
 
@@ -14,6 +14,7 @@
 
 from graphicsUtils import *
 import math, time
+import threading, Queue
 from game import Directions
 
 ###########################
@@ -68,6 +69,10 @@ PACMAN_SCALE = 0.5
 FOOD_COLOR = formatColor(1,1,1)
 FOOD_SIZE = 0.1
 
+# Belief distribution overlay
+DISTRIBUTION_LEVELS = 32  # shades per distribution
+DISTRIBUTION_COLOR_CACHE = {}  # (capture, shades) -> color string
+
 # Laser
 LASER_COLOR = formatColor(1,0,0)
 LASER_SIZE = 0.02
@@ -219,6 +224,7 @@ class PacmanGraphics:
                           filled = 1, behind=2)
           distx.append(block)
     self.distributionImages = dist
+    self.distributionShades = {}  # (x, y) -> shades on screen, for cells that are not black
 
   def drawStaticObjects(self, state):
     layout = self.layout
@@ -650,23 +656,40 @@ class PacmanGraphics:
 
 
   def updateDistributions(self, distributions):
-    "Draws an agent's belief distributions"
+    """
+    Draws an agent's belief distributions.  Weights are quantized to
+    DISTRIBUTION_LEVELS shades, and only cells whose shade changed since the
+    last call are repainted: those with weight in some distribution and
+    those that are not black on screen.
+    """
     if self.distributionImages == None:
       self.drawDistributions(self.previousState)
-    for x in range(len(self.distributionImages)):
-      for y in range(len(self.distributionImages[0])):
-        image = self.distributionImages[x][y]
-        weights = [dist[ (x,y) ] for dist in distributions]
-
-        if sum(weights) != 0:
-          pass
+    colors = GHOST_VEC_COLORS[1:] # With Pacman
+    if self.capture: colors = GHOST_VEC_COLORS
+    width, height = len(self.distributionImages), len(self.distributionImages[0])
+    black = (0,) * len(distributions)
+
+    cells = set(self.distributionShades)
+    for dist in distributions:
+      cells.update(dist)
+    for cell in cells:
+      x, y = cell
+      if x != int(x) or y != int(y) or not (0 <= x < width and 0 <= y < height): continue
+      x, y = int(x), int(y)
+      shades = tuple([int(DISTRIBUTION_LEVELS * dist[(x,y)] ** .3 + 0.5) for dist in distributions])
+      if shades == self.distributionShades.get((x,y), black): continue
+      if shades == black: del self.distributionShades[(x,y)]
+      else: self.distributionShades[(x,y)] = shades
+
+      key = (self.capture, shades)
+      if key not in DISTRIBUTION_COLOR_CACHE:
+        if len(DISTRIBUTION_COLOR_CACHE) > 10000: DISTRIBUTION_COLOR_CACHE.clear()
         # Fog of war
         color = [0.0,0.0,0.0]
-        colors = GHOST_VEC_COLORS[1:] # With Pacman
-        if self.capture: colors = GHOST_VEC_COLORS
-        for weight, gcolor in zip(weights, colors):
-          color = [min(1.0, c + 0.95 * g * weight ** .3) for c,g in zip(color, gcolor)]
-        changeColor(image, formatColor(*color))
+        for shade, gcolor in zip(shades, colors):
+          color = [min(1.0, c + 0.95 * g * shade / float(DISTRIBUTION_LEVELS)) for c,g in zip(color, gcolor)]
+        DISTRIBUTION_COLOR_CACHE[key] = formatColor(*color)
+      changeColor(self.distributionImages[x][y], DISTRIBUTION_COLOR_CACHE[key])
     refresh()
 
 class FirstPersonPacmanGraphics(PacmanGraphics):
@@ -718,6 +741,127 @@ class FirstPersonPacmanGraphics(PacmanGraphics):
 def add(x, y):
   return (x[0] + y[0], x[1] + y[1])
 
+class ThreadedDisplay:
+  """
+  Runs a PacmanGraphics on a thread of its own, so that drawing does not
+  eat into the agents' time or slow the game down (capture.py --fps).
+
+  Every call made on a ThreadedDisplay, including the debugging calls
+  agents make through __main__._display, is queued and run in order on the
+  render thread, which makes all the Tk calls.  The render thread draws at
+  most fps frames a second: the updates that arrive during a frame are
+  coalesced, and the next frame draws the difference between the state on
+  screen and the latest state (agents are moved without animation).
+
+  Keyboard agents read keys from Tk on the game thread, so they cannot be
+  used with a ThreadedDisplay.
+  """
+  def __init__(self, display, fps=30):
+    self.display = display
+    self.frameTime = 1.0 / fps
+    self.commands = Queue.Queue()
+    self.thread = None
+    self.framesDrawn = 0
+    self.updatesDropped = 0
+
+  def initialize(self, state, isBlue = False):
+    if self.thread == None:
+      self.thread = threading.Thread(target=self._render)
+      self.thread.daemon = True
+      self.thread.start()
+    self.commands.put(('_initialize', (state, isBlue), {}, None))
+
+  def update(self, newState):
+    self.commands.put(('update', (newState,), {}, None))
+
+  def finish(self):
+    "Waits until everything queued has been drawn, then closes the window."
+    done = threading.Event()
+    self.commands.put(('finish', (), {}, done))
+    while not done.is_set(): done.wait(0.1)  # a bare wait() would not see KeyboardInterrupt
+
+  def __getattr__(self, name):
+    if name.startswith('_') or not callable(getattr(self.display, name)):
+      raise AttributeError(name)
+    def call(*args, **keyArgs):
+      self.commands.put((name, args, keyArgs, None))
+    return call
+
+  def _render(self):
+    while True:
+      frameStart = time.time()
+      command = self.commands.get()
+      latest = None
+      while True:
+        name, args, keyArgs, done = command
+        if name == 'update':
+          if latest != None: self.updatesDropped += 1
+          latest = args[0]
+        else:
+          if latest != None:
+            self._run(self._draw, latest)
+            latest = None
+          if name == '_initialize':
+            self._run(self._initialize, *args)
+          else:
+            self._run(getattr(self.display, name), *args, **keyArgs)
+          if done != None: done.set()
+        try:
+          command = self.commands.get_nowait()
+        except Queue.Empty:
+          break
+      if latest != None: self._run(self._draw, latest)
+      wait = self.frameTime - (time.time() - frameStart)
+      if wait > 0: sleep(wait)  # keeps the window responsive
+
+  def _run(self, function, *args, **keyArgs):
+    "Calls function, reporting rather than raising its errors so the render thread keeps going."
+    try:
+      function(*args, **keyArgs)
+    except Exception:
+      import traceback
+      traceback.print_exc()
+
+  def _initialize(self, state, isBlue):
+    self.display.initialize(state, isBlue)
+    self.drawnFood = state.food
+    self.drawnCapsules = state.capsules
+
+  def _draw(self, newState):
+    display = self.display
+    for agentIndex, agentState in enumerate(newState.agentStates):
+      prevState, image = display.agentImages[agentIndex]
+      if prevState.isPacman != agentState.isPacman:
+        display.swapImages(agentIndex, agentState)
+        continue
+      if prevState == agentState: continue
+      if agentState.isPacman:
+        display.movePacman(display.getPosition(agentState), display.getDirection(agentState), image)
+      else:
+        display.moveGhost(agentState, agentIndex, prevState, image)
+      display.agentImages[agentIndex] = (agentState, image)
+
+    food = newState.food
+    if food.data is not self.drawnFood.data:
+      for x in range(food.width):
+        if food[x] == self.drawnFood[x]: continue
+        for y in range(food.height):
+          if self.drawnFood[x][y] and not food[x][y]:
+            display.removeFood((x, y), display.food)
+          elif food[x][y] and not self.drawnFood[x][y]:
+            display.addFood((x, y), display.food, newState.layout)
+      self.drawnFood = food
+    for capsule in self.drawnCapsules:
+      if capsule not in newState.capsules:
+        display.removeCapsule(capsule, display.capsules)
+    self.drawnCapsules = newState.capsules
+
+    display.infoPane.updateScore(newState.score, newState.timeleft)
+    if 'ghostDistances' in dir(newState):
+      display.infoPane.updateGhostDistances(newState.ghostDistances)
+    refresh()
+    self.framesDrawn += 1
+
 
 # Saving graphical output
 # -----------------------
@@ -0,0 +1,122 @@
+# eventLog.py
+# -----------
+# A JSON lines log of everything that happens in a game.
+
+"""
+Streaming game event log.
+
+  python capture.py -q -n 10 --eventLog events.jsonl
+
+EventLogger is a game.GameObserver that writes one JSON object per line:
+
+  start        a game began: game number, layout fingerprint, length,
+               startingIndex and the agents' class names
+  move         agent, action, its new position and the score after the move
+  eat          agent ate the food at pos
+  capsule      agent ate the capsule at pos
+  death        agent was eaten (by the agent that moved, if it was not the
+               one eaten) and sent back to its start
+  deposit      agent brought food home
+  timeWarning  agent took longer than the warning time on a move
+  crash        agent crashed
+  timeout      agent ran out of time and forfeits
+  end          the final score and number of moves
+
+Every line carries the game number and the move it happened on.  Lines go
+through a large write buffer that is flushed once per round, so the log can
+be followed live ('tail -f') for the cost of one write call per round.  As
+with any observer, a game without one runs exactly as before.
+"""
+
+import json, time
+from game import Actions, GameObserver
+
+def position(pos):
+  return pos and (int(pos[0]), int(pos[1]))
+
+def agentSnapshot(state):
+  "What moveEvents compares: (position, numCarrying, numReturned) per agent."
+  return [(agentState.getPosition(), agentState.numCarrying, agentState.numReturned)
+          for agentState in state.data.agentStates]
+
+def moveEvents(before, state, agentIndex, action):
+  """
+  The eat, capsule, death and deposit events of one move, as dicts, from
+  the agentSnapshot taken before it and the state after it.
+  """
+  events = []
+  data = state.data
+  if data._foodEaten != None:
+    events.append({'event': 'eat', 'agent': agentIndex, 'pos': position(data._foodEaten)})
+  if data._capsuleEaten != None:
+    events.append({'event': 'capsule', 'agent': agentIndex, 'pos': position(data._capsuleEaten)})
+  for i, agentState in enumerate(data.agentStates):
+    pos, carrying, returned = before[i]
+    expected = pos
+    if i == agentIndex: expected = Actions.getSuccessor(pos, action)
+    if agentState.getPosition() != expected:
+      event = {'event': 'death', 'agent': i, 'pos': position(expected)}
+      if i != agentIndex: event['by'] = agentIndex
+      events.append(event)
+    if agentState.numReturned > returned:
+      events.append({'event': 'deposit', 'agent': i, 'food': agentState.numReturned - returned})
+  return events
+
+class EventLogger(GameObserver):
+  """
+  Logs every game it observes to one file, which is created when the
+  first game starts.
+  """
+  def __init__(self, file='events.jsonl', bufferSize=1 << 16):
+    self.fileName = file
+    self.bufferSize = int(bufferSize)
+    self.file = None
+    self.games = 0
+    self.moves = 0
+    self.before = None
+
+  def write(self, line):
+    line['game'] = self.games
+    line['move'] = self.moves
+    self.file.write(json.dumps(line, separators=(',', ':')) + '\n')
+
+  def gameStarted(self, game):
+    if self.file == None:
+      self.file = open(self.fileName, 'w', self.bufferSize)
+    self.games += 1
+    self.moves = 0
+    self.write({'event': 'start', 'time': time.time(),
+                'layout': game.state.data.layout.fingerprint(),
+                'length': game.length,
+                'startingIndex': game.startingIndex,
+                'agents': [agent.__class__.__name__ for agent in game.agents]})
+    self.file.flush()
+
+  def postAction(self, game, agentIndex, action):
+    self.before = agentSnapshot(game.state)
+
+  def postSuccessor(self, game, agentIndex, action, state):
+    self.moves += 1
+    agentState = state.data.agentStates[agentIndex]
+    self.write({'event': 'move', 'agent': agentIndex, 'action': action,
+                'pos': position(agentState.getPosition()), 'score': state.data.score})
+    for event in moveEvents(self.before, state, agentIndex, action):
+      self.write(event)
+    if self.moves % len(game.agents) == 0: self.file.flush()
+
+  def agentTimeWarning(self, game, agentIndex, warnings):
+    self.write({'event': 'timeWarning', 'agent': agentIndex, 'warnings': warnings})
+
+  def agentCrashed(self, game, agentIndex):
+    self.write({'event': 'crash', 'agent': agentIndex})
+
+  def agentTimedOut(self, game, agentIndex):
+    self.write({'event': 'timeout', 'agent': agentIndex})
+
+  def gameEnded(self, game):
+    self.write({'event': 'end', 'time': time.time(), 'score': game.state.data.score})
+    self.file.flush()
+
+  def close(self):
+    if self.file != None: self.file.close()
+    self.file = None
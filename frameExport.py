@@ -0,0 +1,206 @@
+# frameExport.py
+# --------------
+# Renders recorded games to PNG frames without a display.
+
+"""
+Offline frame export.
+
+Turns a replay (see replay.py) into a numbered PNG image sequence, without
+Tk or a display server:
+
+  python frameExport.py replay-0 -o frames --start 400 --end 700 -j 4
+  ffmpeg -framerate 30 -i frames/frame_%05d.png clip.mp4
+
+Frames are drawn into an RGB byte buffer by a small rasterizer (walls,
+food, capsules, agents and a score line in a built-in 3x5 digit font) and
+written by a pure-Python PNG encoder (struct and zlib).  The moves to draw
+are split into chunks that are rendered on a process pool; each worker
+seeks to the start of its chunk with Replay.stateAt, so no worker replays
+the game from the beginning.
+"""
+
+import sys, os, struct, zlib
+import multiprocessing
+import replay
+
+BACKGROUND = (0, 0, 0)
+WALL = (0, 51, 255)
+TEAM_COLORS = [(230, 0, 0), (0, 77, 230)]
+GHOST_COLORS = [(230, 0, 0), (0, 77, 230), (250, 105, 18), (26, 191, 179)]
+PACMAN_COLOR = (255, 255, 61)
+SCARED_COLOR = (255, 255, 255)
+CAPSULE_COLOR = (255, 255, 255)
+TEXT_COLOR = (230, 230, 230)
+
+FONT = {'0': ['111', '101', '101', '101', '111'],
+        '1': ['010', '110', '010', '010', '111'],
+        '2': ['111', '001', '111', '100', '111'],
+        '3': ['111', '001', '111', '001', '111'],
+        '4': ['101', '101', '111', '001', '001'],
+        '5': ['111', '100', '111', '001', '111'],
+        '6': ['111', '100', '111', '101', '111'],
+        '7': ['111', '001', '001', '001', '001'],
+        '8': ['111', '101', '111', '101', '111'],
+        '9': ['111', '101', '111', '001', '111'],
+        '-': ['000', '000', '111', '000', '000'],
+        ' ': ['000', '000', '000', '000', '000']}
+
+def pngChunk(kind, data):
+  return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+def writePNG(fileName, width, height, pixels):
+  "Writes an 8-bit RGB PNG; pixels is a bytearray of rows, top row first."
+  rowBytes = width * 3
+  raw = ''.join(['\x00' + str(pixels[y * rowBytes:(y + 1) * rowBytes]) for y in range(height)])
+  with open(fileName, 'wb') as f:
+    f.write('\x89PNG\r\n\x1a\n')
+    f.write(pngChunk('IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+    f.write(pngChunk('IDAT', zlib.compress(raw, 6)))
+    f.write(pngChunk('IEND', ''))
+
+class FrameRenderer:
+  "Draws game states of one layout, cellSize pixels per maze cell."
+  def __init__(self, layout, cellSize=16):
+    self.layout = layout
+    self.cellSize = cellSize
+    self.paneHeight = max(8, cellSize * 3 / 2)
+    self.width = layout.width * cellSize
+    self.height = layout.height * cellSize + self.paneHeight
+    self.pixels = bytearray(str(bytearray(BACKGROUND)) * (self.width * self.height))
+    walls = layout.walls
+    for x in range(walls.width):
+      for y in range(walls.height):
+        if walls[x][y]:
+          left, top = self.toScreen((x, y))
+          self.fillRect(left, top, left + cellSize, top + cellSize, WALL)
+    self.background = self.pixels[:]
+
+  def toScreen(self, pos):
+    "Top left pixel of the cell at pos."
+    x, y = pos
+    return int(round(x * self.cellSize)), int(round((self.layout.height - 1 - y) * self.cellSize))
+
+  def fillRect(self, left, top, right, bottom, color):
+    left, right = max(0, left), min(self.width, right)
+    top, bottom = max(0, top), min(self.height, bottom)
+    if right <= left: return
+    span = str(bytearray(color)) * (right - left)
+    for y in range(top, bottom):
+      start = (y * self.width + left) * 3
+      self.pixels[start:start + len(span)] = span
+
+  def fillCircle(self, cx, cy, r, color):
+    "A disc centred on the pixel corner (cx, cy)."
+    for dy in range(-int(r), int(r) + 1):
+      half = int((r * r - (dy + 0.5) ** 2) ** 0.5 + 0.5) if (dy + 0.5) ** 2 < r * r else 0
+      if half: self.fillRect(cx - half, cy + dy, cx + half, cy + dy + 1, color)
+
+  def drawText(self, text, left, top, scale, color):
+    for char in text:
+      for row, bits in enumerate(FONT.get(char, FONT[' '])):
+        for col, bit in enumerate(bits):
+          if bit == '1':
+            self.fillRect(left + col * scale, top + row * scale, left + (col + 1) * scale, top + (row + 1) * scale, color)
+      left += 4 * scale
+
+  def render(self, data):
+    "Draws a GameStateData and returns the pixels."
+    self.pixels[:] = self.background
+    size = self.cellSize
+    food = data.food
+    dot = max(2, size / 5)
+    for x in range(food.width):
+      color = TEAM_COLORS[int(x >= food.width / 2)]
+      for y in range(food.height):
+        if food[x][y]:
+          left, top = self.toScreen((x, y))
+          self.fillRect(left + (size - dot) / 2, top + (size - dot) / 2, left + (size + dot) / 2, top + (size + dot) / 2, color)
+    for capsule in data.capsules:
+      left, top = self.toScreen(capsule)
+      self.fillCircle(left + size / 2, top + size / 2, size * 0.25, CAPSULE_COLOR)
+
+    for index, agentState in enumerate(data.agentStates):
+      if agentState.configuration == None: continue
+      left, top = self.toScreen(agentState.getPosition())
+      cx, cy = left + size / 2, top + size / 2
+      r = size * 0.45
+      if agentState.isPacman:
+        self.fillCircle(cx, cy, r, TEAM_COLORS[index % 2])
+        self.fillCircle(cx, cy, max(1, r - max(1, size / 8)), PACMAN_COLOR)
+      else:
+        color = GHOST_COLORS[index % len(GHOST_COLORS)]
+        if agentState.scaredTimer > 0: color = SCARED_COLOR
+        self.fillCircle(cx, cy, r, color)
+        self.fillRect(int(cx - r), cy, int(cx + r), int(cy + r), color)
+        eye = max(1, size / 8)
+        for ex in [cx - size / 5, cx + size / 5]:
+          self.fillRect(ex - eye / 2, cy - size / 6, ex - eye / 2 + eye, cy - size / 6 + eye, (255, 255, 255))
+
+    scale = max(1, self.paneHeight / 8)
+    top = self.height - self.paneHeight + (self.paneHeight - 5 * scale) / 2
+    scoreColor = TEXT_COLOR
+    if data.score > 0: scoreColor = TEAM_COLORS[0]
+    if data.score < 0: scoreColor = TEAM_COLORS[1]
+    self.drawText(str(data.score), scale * 2, top, scale, scoreColor)
+    timeText = str(data.timeleft)
+    self.drawText(timeText, self.width - (4 * len(timeText) + 1) * scale, top, scale, TEXT_COLOR)
+    return self.pixels
+
+def frameName(outputDir, frame):
+  return os.path.join(outputDir, 'frame_%05d.png' % frame)
+
+def renderChunk(task):
+  "Runs in the pool: renders the (frame, move) pairs of one chunk and returns how many."
+  replayFile, outputDir, frames, cellSize = task
+  recorded = replay.readReplay(replayFile)
+  renderer = FrameRenderer(recorded.layout, cellSize)
+  wanted = dict([(move, frame) for frame, move in frames])
+  for move, state in recorded.states(frames[0][1], frames[-1][1]):
+    if move in wanted:
+      writePNG(frameName(outputDir, wanted[move]), renderer.width, renderer.height, renderer.render(state.data))
+  return len(frames)
+
+def exportFrames(replayFile, outputDir, start=0, end=None, every=1, cellSize=16, numWorkers=1, chunkSize=50):
+  """
+  Writes the state after every every-th move from start to end as
+  outputDir/frame_00000.png, frame_00001.png, ... and returns the number
+  of frames written.
+  """
+  recorded = replay.readReplay(replayFile)
+  if end == None or end > len(recorded.actions): end = len(recorded.actions)
+  if not os.path.exists(outputDir): os.makedirs(outputDir)
+  frames = list(enumerate(range(start, end + 1, every)))
+  chunks = [(replayFile, outputDir, frames[i:i + chunkSize], cellSize) for i in range(0, len(frames), chunkSize)]
+  if numWorkers > 1:
+    pool = multiprocessing.Pool(numWorkers)
+    try:
+      written = sum(pool.imap_unordered(renderChunk, chunks))
+    finally:
+      pool.terminate()
+      pool.join()
+  else:
+    written = sum(map(renderChunk, chunks))
+  return written
+
+def readCommand(argv):
+  from optparse import OptionParser
+  import capture
+  parser = OptionParser('python frameExport.py [options] REPLAY')
+  parser.add_option('-o', '--output', help=capture.default('Directory for the frames'), default='frames')
+  parser.add_option('--start', type='int', help=capture.default('First move to draw'), default=0)
+  parser.add_option('--end', type='int', help='Last move to draw [Default: the end of the game]', default=None)
+  parser.add_option('--every', type='int', help=capture.default('Draw every Nth move'), default=1)
+  parser.add_option('--cell', type='int', help=capture.default('Pixels per maze cell'), default=16)
+  parser.add_option('-j', '--workers', type='int', help=capture.default('Number of processes'),
+                    default=multiprocessing.cpu_count())
+  options, args = parser.parse_args(argv)
+  if len(args) != 1: parser.error('Give exactly one replay file')
+  return options, args[0]
+
+if __name__ == '__main__':
+  import time
+  options, replayFile = readCommand(sys.argv[1:])
+  start = time.time()
+  written = exportFrames(replayFile, options.output, options.start, options.end, options.every,
+                         options.cell, options.workers)
+  print 'Wrote %d frames to %s in %.1f s' % (written, options.output, time.time() - start)
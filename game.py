@@ -504,6 +504,48 @@ class GameStateData:
             self.agentStates.append( AgentState( Configuration( pos, Directions.STOP), isPacman) )
         self._eaten = [False for a in self.agentStates]
 
+class GameObserver:
+    """
+    Base class for objects that watch a game from outside, such as
+    profilers, event loggers or live statistics.  Register one with
+    Game.addObserver (or capture.py --observer) and override the events
+    of interest; agents are never told about observers.
+
+    Game.run only looks at its observers when there are any, so an
+    unobserved game runs exactly as before.
+    """
+    def gameStarted(self, game):
+        "Called before the display is initialized and agents are set up."
+        pass
+
+    def preObservation(self, game, agentIndex):
+        "Called at the start of each turn, before the agent observes the state."
+        pass
+
+    def postAction(self, game, agentIndex, action):
+        "Called once the agent has chosen its action."
+        pass
+
+    def postSuccessor(self, game, agentIndex, action, state):
+        "Called after the action has been applied; state is the new game state."
+        pass
+
+    def agentCrashed(self, game, agentIndex):
+        "Called when an agent fails to load or raises an exception."
+        pass
+
+    def agentTimedOut(self, game, agentIndex):
+        "Called when an agent forfeits by running out of time."
+        pass
+
+    def agentTimeWarning(self, game, agentIndex, warnings):
+        "Called when a move took longer than the warning time; warnings counts them so far."
+        pass
+
+    def gameEnded(self, game):
+        "Called when the game is over, however it ended."
+        pass
+
 try:
     import boinc
     _BOINC_ENABLED = True
@@ -515,7 +557,7 @@ class Game:
     The Game manages the control flow, soliciting actions from agents.
     """
 
-    def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False ):
+    def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False, training=False ):
         self.agentCrashed = False
         self.agents = agents
         self.display = display
@@ -524,12 +566,20 @@ class Game:
         self.gameOver = False
         self.muteAgents = muteAgents
         self.catchExceptions = catchExceptions
+        # A training game keeps no moveHistory or agent output and draws nothing
+        self.training = training
         self.moveHistory = []
+        self.numMoves = 0
         self.totalAgentTimes = [0 for agent in agents]
         self.totalAgentTimeWarnings = [0 for agent in agents]
         self.agentTimeout = False
-        import cStringIO
-        self.agentOutput = [cStringIO.StringIO() for agent in agents]
+        if training:
+            self.agentOutput = [WritableNull()] * len(agents)
+        else:
+            import cStringIO
+            self.agentOutput = [cStringIO.StringIO() for agent in agents]
+        self.timer = None # a phaseTimer.PhaseTimer to time each phase of each turn
+        self.observers = []
 
     def getProgress(self):
         if self.gameOver:
@@ -537,12 +587,19 @@ class Game:
         else:
             return self.rules.getProgress(self)
 
+    def addObserver(self, observer):
+        "Registers a GameObserver to be told about the events of this game"
+        self.observers.append(observer)
+
     def _agentCrash( self, agentIndex, quiet=False):
         "Helper method for handling agent crashes"
         if not quiet: traceback.print_exc()
         self.gameOver = True
         self.agentCrashed = True
         self.rules.agentCrash(self, agentIndex)
+        for observer in self.observers:
+            if self.agentTimeout: observer.agentTimedOut(self, agentIndex)
+            else: observer.agentCrashed(self, agentIndex)
 
     OLD_STDOUT = None
     OLD_STDERR = None
@@ -550,7 +607,6 @@ class Game:
     def mute(self, agentIndex):
         if not self.muteAgents: return
         global OLD_STDOUT, OLD_STDERR
-        import cStringIO
         OLD_STDOUT = sys.stdout
         OLD_STDERR = sys.stderr
         sys.stdout = self.agentOutput[agentIndex]
@@ -564,14 +620,34 @@ class Game:
         sys.stderr = OLD_STDERR
 
 
+    def _recordPhase(self, phase, agentIndex, start):
+        "Records the time since start against a phase and returns the current time"
+        now = time.time()
+        self.timer.record(phase, agentIndex, now - start)
+        return now
+
     def run( self ):
         """
         Main control loop for game play.
         """
-        self.display.initialize(self.state.data)
+        if not self.observers:
+            return self._run()
+        for observer in self.observers: observer.gameStarted(self)
+        try:
+            self._run()
+        finally:
+            for observer in self.observers: observer.gameEnded(self)
+
+    def _run( self ):
+        training = self.training
+        if not training: self.display.initialize(self.state.data)
         self.numMoves = 0
 
         ###self.display.initialize(self.state.makeObservation(1).data)
+        # Look up what the agents support once per game rather than with dir() every turn
+        observationFunctions = [getattr(agent, 'observationFunction', None) for agent in self.agents]
+        deadlineSetters = [getattr(agent, 'setMoveDeadline', None) for agent in self.agents]
+
         # inform learning agents of the game start
         for i in range(len(self.agents)):
             agent = self.agents[i]
@@ -583,11 +659,14 @@ class Game:
                 self.unmute()
                 self._agentCrash(i, quiet=True)
                 return
-            if ("registerInitialState" in dir(agent)):
+            registerInitialState = getattr(agent, 'registerInitialState', None)
+            if registerInitialState != None:
                 self.mute(i)
+                if deadlineSetters[i] != None:
+                    deadlineSetters[i](Deadline(self.rules.getMaxStartupTime(i)))
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.registerInitialState, int(self.rules.getMaxStartupTime(i)))
+                        timed_func = TimeoutFunction(registerInitialState, self.rules.getMaxStartupTime(i))
                         try:
                             start_time = time.time()
                             timed_func(self.state.deepCopy())
@@ -604,27 +683,44 @@ class Game:
                         self.unmute()
                         return
                 else:
-                    agent.registerInitialState(self.state.deepCopy())
+                    registerInitialState(self.state.deepCopy())
                 ## TODO: could this exceed the total time
                 self.unmute()
 
         agentIndex = self.startingIndex
         numAgents = len( self.agents )
+        timer = self.timer
+        observers = self.observers
+        getMoveTimeout, getMoveWarningTime = self.rules.getMoveTimeout, self.rules.getMoveWarningTime
+        process = self.rules.process
+        updateDisplay = self.display.update
 
         while not self.gameOver:
             # Fetch the next agent
             agent = self.agents[agentIndex]
+            if timer: turnStart = time.time()
+            if observers:
+                for observer in observers: observer.preObservation(self, agentIndex)
             move_time = 0
             skip_action = False
             # Generate an observation of the state
-            if 'observationFunction' in dir( agent ):
+            if timer: phaseStart = time.time()
+            stateCopy = self.state.deepCopy()
+            if timer: phaseStart = self._recordPhase('observation', agentIndex, phaseStart)
+            # The move's time budget covers observationFunction and getAction,
+            # but not the engine's copy of the state above
+            deadline = Deadline(getMoveTimeout(agentIndex), getMoveWarningTime(agentIndex))
+            if deadlineSetters[agentIndex] != None:
+                deadlineSetters[agentIndex](deadline)
+            observationFunction = observationFunctions[agentIndex]
+            if observationFunction != None:
                 self.mute(agentIndex)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.observationFunction, int(self.rules.getMoveTimeout(agentIndex)))
+                        timed_func = TimeoutFunction(observationFunction, deadline.timeRemaining())
                         try:
                             start_time = time.time()
-                            observation = timed_func(self.state.deepCopy())
+                            observation = timed_func(stateCopy)
                         except TimeoutFunctionException:
                             skip_action = True
                         move_time += time.time() - start_time
@@ -634,17 +730,19 @@ class Game:
                         self.unmute()
                         return
                 else:
-                    observation = agent.observationFunction(self.state.deepCopy())
+                    observation = observationFunction(stateCopy)
                 self.unmute()
+                if timer: self._recordPhase('observationFunction', agentIndex, phaseStart)
             else:
-                observation = self.state.deepCopy()
+                observation = stateCopy
 
             # Solicit an action
+            if timer: phaseStart = time.time()
             action = None
             self.mute(agentIndex)
             if self.catchExceptions:
                 try:
-                    timed_func = TimeoutFunction(agent.getAction, int(self.rules.getMoveTimeout(agentIndex)) - int(move_time))
+                    timed_func = TimeoutFunction(agent.getAction, deadline.timeRemaining())
                     try:
                         start_time = time.time()
                         if skip_action:
@@ -659,9 +757,11 @@ class Game:
 
                     move_time += time.time() - start_time
 
-                    if move_time > self.rules.getMoveWarningTime(agentIndex):
+                    if move_time > getMoveWarningTime(agentIndex):
                         self.totalAgentTimeWarnings[agentIndex] += 1
                         print >>sys.stderr, "Agent %d took too long to make a move! This is warning %d" % (agentIndex, self.totalAgentTimeWarnings[agentIndex])
+                        if observers:
+                            for observer in observers: observer.agentTimeWarning(self, agentIndex, self.totalAgentTimeWarnings[agentIndex])
                         if self.totalAgentTimeWarnings[agentIndex] > self.rules.getMaxTimeWarnings(agentIndex):
                             print >>sys.stderr, "Agent %d exceeded the maximum number of warnings: %d" % (agentIndex, self.totalAgentTimeWarnings[agentIndex])
                             self.agentTimeout = True
@@ -685,9 +785,12 @@ class Game:
             else:
                 action = agent.getAction(observation)
             self.unmute()
+            if timer: phaseStart = self._recordPhase('getAction', agentIndex, phaseStart)
+            if observers:
+                for observer in observers: observer.postAction(self, agentIndex, action)
 
             # Execute the action
-            self.moveHistory.append( (agentIndex, action) )
+            if not training: self.moveHistory.append( (agentIndex, action) )
             if self.catchExceptions:
                 try:
                     self.state = self.state.generateSuccessor( agentIndex, action )
@@ -698,16 +801,23 @@ class Game:
                     return
             else:
                 self.state = self.state.generateSuccessor( agentIndex, action )
+            # Track progress
+            self.numMoves += 1
+            if timer: phaseStart = self._recordPhase('generateSuccessor', agentIndex, phaseStart)
+            if observers:
+                for observer in observers: observer.postSuccessor(self, agentIndex, action, self.state)
 
             # Change the display
-            self.display.update( self.state.data )
+            if not training: updateDisplay( self.state.data )
             ###idx = agentIndex - agentIndex % 2 + 1
             ###self.display.update( self.state.makeObservation(idx).data )
+            if timer: phaseStart = self._recordPhase('display', agentIndex, phaseStart)
 
             # Allow for game specific conditions (winning, losing, etc.)
-            self.rules.process(self.state, self)
-            # Track progress
-            if agentIndex == numAgents + 1: self.numMoves += 1
+            process(self.state, self)
+            if timer:
+                self._recordPhase('rules', agentIndex, phaseStart)
+                self._recordPhase('turn', agentIndex, turnStart)
             # Next agent
             agentIndex = ( agentIndex + 1 ) % numAgents
 
@@ -716,14 +826,15 @@ class Game:
 
         # inform a learning agent of the game result
         for agentIndex, agent in enumerate(self.agents):
-            if "final" in dir( agent ) :
+            final = getattr(agent, 'final', None)
+            if final != None:
                 try:
                     self.mute(agentIndex)
-                    agent.final( self.state )
+                    final( self.state )
                     self.unmute()
                 except Exception,data:
                     if not self.catchExceptions: raise
                     self._agentCrash(agentIndex)
                     self.unmute()
                     return
-        self.display.finish()
+        if not training: self.display.finish()
@@ -12,35 +12,61 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
-import sys, random
+import sys, random, time
 
-import mazeGenerator
+import mazeGenerator, layout
 
 """
 This is a helper file which generates the random seeds for the map
 layouts for the nightly tournament.
+
+  python generateTournamentLayouts.py 9
+      writes layouts/random<seed>Capture.lay for 9 random seeds and the
+      seeds to ../driver/SEEDS
+  python generateTournamentLayouts.py 10000 -j 8 --archive mazes.pcla
+      writes 10000 mazes to one layout archive (see layout.writeArchive),
+      which capture.py reads with --layoutArchive
+
+Mazes are generated on a pool of -j processes; each seed always gives
+the same maze.
 """
 
 if __name__=="__main__":
+  from optparse import OptionParser
+  parser = OptionParser('python generateTournamentLayouts.py [options] [NUMBER]')
+  parser.add_option('-j', '--workers', type='int', default=1,
+                    help='Number of processes [Default: %default]')
+  parser.add_option('--archive', default=None, metavar='FILE',
+                    help='Write the mazes to one layout archive instead of layouts/ and the seeds file')
+  parser.add_option('--firstSeed', type='int', default=None, metavar='SEED',
+                    help='Use the seeds SEED, SEED+1, ... instead of random ones')
+  options, args = parser.parse_args()
   num = 9
-  if len(sys.argv) > 1: # command line argument: number of maps to generate
-    num = int(sys.argv[1])
+  if args: # command line argument: number of maps to generate
+    num = int(args[0])
+
+  if options.firstSeed != None:
+    seeds = range(options.firstSeed, options.firstSeed + num)
+  else:
+    seeds = [random.randint(1,99999999) for i in range(num)]
+  mazes = mazeGenerator.generateMazes(seeds, options.workers)
+
+  if options.archive:
+    start = time.time()
+    layouts, stored = layout.writeArchive(options.archive, mazes)
+    print 'Wrote %d mazes (%d distinct) to %s in %.1f s' % (stored, layouts, options.archive, time.time() - start)
+    sys.exit(0)
 
   seedsfile = '../driver/SEEDS'
   with open(seedsfile,'w') as out:
     pass
 
-  for i in range(num):
-    seed = random.randint(0,99999999)
-    layout = 'layouts/random%08dCapture.lay' % seed
-    print 'Generating random layout in %s' % layout
-    with open(layout, 'w') as out:
-      maze = mazeGenerator.generateMaze(seed)
+  for seed, maze in mazes:
+    layoutFile = 'layouts/random%08dCapture.lay' % seed
+    print 'Generating random layout in %s' % layoutFile
+    with open(layoutFile, 'w') as out:
       out.write(maze)
       print maze
 
     with open(seedsfile, 'a') as out:
       out.write("%d\n"%seed)
-
-
-
@@ -15,9 +15,14 @@
 from util import manhattanDistance
 from game import Grid
 import os
+import re
 import random
+import hashlib
+import threading
+import struct, zlib, mmap
 
 VISIBILITY_MATRIX_CACHE = {}
+LAYOUT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'layouts')
 
 class Layout:
     """
@@ -92,6 +97,13 @@ class Layout:
     def deepCopy(self):
         return Layout(self.layoutText[:])
 
+    def fingerprint(self):
+        """
+        A short hash of the layout text, which identifies the maze together
+        with its starting food, capsules and agent positions.
+        """
+        return textFingerprint('\n'.join(self.layoutText))
+
     def processLayoutText(self, layoutText):
         """
         Coordinates are flipped from the input format to the (x,y) convention here
@@ -128,19 +140,260 @@ class Layout:
         elif layoutChar in  ['1', '2', '3', '4']:
             self.agentPositions.append( (int(layoutChar), (x,y)))
             self.numGhosts += 1
+
+
+def textFingerprint(text):
+    "The Layout.fingerprint of the layout with this text (lines joined by newlines)."
+    return hashlib.sha1(text).hexdigest()[:16]
+
+
+ARCHIVE_MAGIC = 'PCLA'
+ARCHIVE_VERSION = 1
+ARCHIVE_HEADER = '<4sBII'
+ARCHIVE_LAYOUT = '<16sII'
+ARCHIVE_SEED = '<II'
+
+
+def writeArchive(fileName, mazes):
+    """
+    Writes (seed, layout text) pairs to a layout archive and returns
+    (layouts stored, seeds stored).  Mazes with the same fingerprint are
+    stored once, and every seed refers to its maze.
+
+    An archive is one file holding
+      the header: 'PCLA', a version byte, the number of layouts and the
+          number of seeds (4-byte little-endian each)
+      the layout index: per layout, its 16-character fingerprint and the
+          offset and length of its text, sorted by fingerprint
+      the seed index: per seed, the seed and the number of its layout in
+          the layout index, sorted by seed
+      the zlib-compressed layout texts
+    so LayoutArchive can find a layout by binary search on a memory map
+    without reading the rest of the file.  Seeds must be integers from 0
+    to 2**32 - 1.
+    """
+    texts = {}
+    seeds = {}
+    for seed, text in mazes:
+        # Checked before the file is opened, so a bad seed leaves no partial archive
+        if not isinstance(seed, (int, long)) or not 0 <= seed < 2 ** 32:
+            raise Exception('Seed %r cannot be stored in a layout archive; seeds must be integers from 0 to %d' % (seed, 2 ** 32 - 1))
+        fingerprint = textFingerprint(text)
+        if fingerprint not in texts: texts[fingerprint] = zlib.compress(text, 9)
+        seeds.setdefault(seed, fingerprint)
+    fingerprints = sorted(texts)
+    numbers = dict([(fingerprint, i) for i, fingerprint in enumerate(fingerprints)])
+    offset = (struct.calcsize(ARCHIVE_HEADER) + len(fingerprints) * struct.calcsize(ARCHIVE_LAYOUT) +
+              len(seeds) * struct.calcsize(ARCHIVE_SEED))
+    with open(fileName, 'wb') as f:
+        f.write(struct.pack(ARCHIVE_HEADER, ARCHIVE_MAGIC, ARCHIVE_VERSION, len(fingerprints), len(seeds)))
+        for fingerprint in fingerprints:
+            f.write(struct.pack(ARCHIVE_LAYOUT, fingerprint, offset, len(texts[fingerprint])))
+            offset += len(texts[fingerprint])
+        for seed in sorted(seeds):
+            f.write(struct.pack(ARCHIVE_SEED, seed, numbers[seeds[seed]]))
+        for fingerprint in fingerprints:
+            f.write(texts[fingerprint])
+    return len(fingerprints), len(seeds)
+
+
+class LayoutArchive:
+    """
+    A layout archive (see writeArchive), memory-mapped.  Lookups read only
+    the index entries and the layout they need.
+    """
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        with open(fileName, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.numLayouts, self.numSeeds = struct.unpack_from(ARCHIVE_HEADER, self.data, 0)
+        if magic != ARCHIVE_MAGIC:
+            raise Exception('%s is not a layout archive' % fileName)
+        if version != ARCHIVE_VERSION:
+            raise Exception('%s is a version %d layout archive; only version %d is supported' % (fileName, version, ARCHIVE_VERSION))
+        self.layoutStart = struct.calcsize(ARCHIVE_HEADER)
+        self.layoutSize = struct.calcsize(ARCHIVE_LAYOUT)
+        self.seedStart = self.layoutStart + self.numLayouts * self.layoutSize
+        self.seedSize = struct.calcsize(ARCHIVE_SEED)
+
+    def __len__(self):
+        return self.numLayouts
+
+    def fingerprint(self, i):
+        return struct.unpack_from(ARCHIVE_LAYOUT, self.data, self.layoutStart + i * self.layoutSize)[0]
+
+    def seed(self, i):
+        return struct.unpack_from(ARCHIVE_SEED, self.data, self.seedStart + i * self.seedSize)
+
+    def text(self, i):
+        "The text of the i-th layout, in fingerprint order."
+        fingerprint, offset, length = struct.unpack_from(ARCHIVE_LAYOUT, self.data, self.layoutStart + i * self.layoutSize)
+        return zlib.decompress(self.data[offset:offset + length])
+
+    def _search(self, key, count, get):
+        "The index whose key is key among count sorted entries, or None."
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) / 2
+            if get(middle) < key: low = middle + 1
+            else: high = middle
+        if low < count and get(low) == key: return low
+        return None
+
+    def findFingerprint(self, fingerprint):
+        "The text of the layout with this fingerprint, or None."
+        i = self._search(fingerprint, self.numLayouts, self.fingerprint)
+        if i == None: return None
+        return self.text(i)
+
+    def findSeed(self, seed):
+        "The text of the maze generated from this seed, or None."
+        i = self._search(seed, self.numSeeds, lambda i: self.seed(i)[0])
+        if i == None: return None
+        return self.text(self.seed(i)[1])
+
+    def seeds(self):
+        return [self.seed(i)[0] for i in range(self.numSeeds)]
+
+    def close(self):
+        self.data.close()
+
+
+RANDOM_LAYOUT_NAME = re.compile(r'^random(\d+)Capture(\.lay)?$')
+
+
+class LayoutRegistry:
+    """
+    Finds layout files and keeps the Layouts parsed from them, so each file
+    is read and parsed once per process.
+
+    A name is looked up as getLayout always has: NAME.lay (or NAME, if it
+    ends in .lay) in layouts/ and then in the directory itself, for the
+    current directory and up to `back` directories above it, and finally
+    in the layouts/ directory next to this module.  Paths are built rather
+    than changing directory, and every directory is listed once, so the
+    registry can be used from several threads.  A name missing from a
+    listing is checked on disk as well, so files written after a directory
+    was listed are still found; call refresh to have findByFingerprint
+    see them too.
+
+    Layout archives added with addArchive are searched for fingerprints,
+    and for names of the form random<seed>Capture (the files
+    generateTournamentLayouts.py writes) when no such file exists.
+
+    The Layouts it returns are shared by everyone who asks for the same
+    file and must not be changed; use deepCopy for a private one.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.listings = {}      # directory -> the names of the .lay files in it
+        self.byPath = {}
+        self.byFingerprint = {}
+        self.archives = []
+
+    def addArchive(self, fileName):
+        "Makes the layouts in a layout archive (see writeArchive) available."
+        with self.lock:
+            self.archives.append(LayoutArchive(fileName))
+
+    def fromText(self, text):
+        "The Layout for a text, shared with any earlier Layout of the same text."
+        fingerprint = textFingerprint(text)
+        with self.lock:
+            if fingerprint not in self.byFingerprint:
+                self.byFingerprint[fingerprint] = Layout(text.split('\n'))
+            return self.byFingerprint[fingerprint]
+
+    def findSeed(self, seed):
+        "The maze generated from a seed, from the archives, or None."
+        for archive in self.archives:
+            text = archive.findSeed(seed)
+            if text != None: return self.fromText(text)
+        return None
+
+    def searchPath(self, back=2):
+        directories = []
+        base = os.path.abspath('.')
+        for level in range(back + 2):
+            directories += [os.path.join(base, 'layouts'), base]
+            base = os.path.dirname(base)
+        directories.append(LAYOUT_DIRECTORY)
+        return directories
+
+    def listing(self, directory):
+        with self.lock:
+            if directory not in self.listings:
+                try:
+                    names = [name for name in os.listdir(directory) if name.endswith('.lay')]
+                except OSError:
+                    names = []
+                self.listings[directory] = set(names)
+            return self.listings[directory]
+
+    def refresh(self):
+        "Forgets the directory listings, so they are read again on next use."
+        with self.lock:
+            self.listings.clear()
+
+    def find(self, name, back=2):
+        "The path of the layout file for a name, or None."
+        fileName = name
+        if not fileName.endswith('.lay'): fileName += '.lay'
+        for directory in self.searchPath(back):
+            path = os.path.join(directory, fileName)
+            if os.sep in fileName or (os.altsep and os.altsep in fileName):
+                if os.path.isfile(path): return os.path.normpath(path)
+            elif fileName in self.listing(directory):
+                return path
+            elif os.path.isfile(path):
+                # Written since the directory was listed
+                with self.lock:
+                    self.listing(directory).add(fileName)
+                return path
+        return None
+
+    def load(self, path):
+        "The Layout in a file, parsed on first use."
+        path = os.path.abspath(path)
+        with self.lock:
+            if path not in self.byPath:
+                layout = tryToLoad(path)
+                if layout == None: return None
+                self.byPath[path] = layout
+                self.byFingerprint.setdefault(layout.fingerprint(), layout)
+            return self.byPath[path]
+
+    def get(self, name, back=2):
+        path = self.find(name, back)
+        if path != None: return self.load(path)
+        match = RANDOM_LAYOUT_NAME.match(os.path.basename(name))
+        if match and self.archives: return self.findSeed(int(match.group(1)))
+        return None
+
+    def findByFingerprint(self, fingerprint, back=2):
+        """
+        The layout with a Layout.fingerprint, from the files on the search
+        path, or None.
+        """
+        with self.lock:
+            if fingerprint in self.byFingerprint: return self.byFingerprint[fingerprint]
+            for archive in self.archives:
+                text = archive.findFingerprint(fingerprint)
+                if text != None: return self.fromText(text)
+            for directory in self.searchPath(back):
+                for fileName in sorted(self.listing(directory)):
+                    layout = self.load(os.path.join(directory, fileName))
+                    if layout != None and layout.fingerprint() == fingerprint: return layout
+        return None
+
+
+REGISTRY = LayoutRegistry()
+
+
 def getLayout(name, back = 2):
-    if name.endswith('.lay'):
-        layout = tryToLoad('layouts/' + name)
-        if layout == None: layout = tryToLoad(name)
-    else:
-        layout = tryToLoad('layouts/' + name + '.lay')
-        if layout == None: layout = tryToLoad(name + '.lay')
-    if layout == None and back >= 0:
-        curdir = os.path.abspath('.')
-        os.chdir('..')
-        layout = getLayout(name, back -1)
-        os.chdir(curdir)
-    return layout
+    return REGISTRY.get(name, back)
 
 def tryToLoad(fullname):
     if(not os.path.exists(fullname)): return None
@@ -0,0 +1,119 @@
+# phaseTimer.py
+# -------------
+# Per-phase timing of the game loop.
+
+"""
+Timing instrumentation for Game.run.
+
+When a PhaseTimer is attached to a game (python capture.py --timing FILE),
+Game.run times every phase of every turn for the agent whose turn it is:
+
+  observation          copying the state handed to the agent
+  observationFunction  the agent's observationFunction
+  getAction            the agent's getAction
+  generateSuccessor    applying the action
+  display              display.update
+  rules                rules.process
+  turn                 the whole turn
+
+Samples go into log-spaced histograms (buckets 5% wide), so a batch of any
+size takes constant memory; percentiles are read off the histograms and
+max, mean and count are exact.  write() exports the summary as JSON.
+"""
+
+import math, json
+
+BUCKET_RATIO = 1.05
+SMALLEST = 1e-7  # seconds; anything faster lands in the first bucket
+
+PHASES = ['observation', 'observationFunction', 'getAction', 'generateSuccessor', 'display', 'rules', 'turn']
+
+class Histogram:
+  "A log-bucketed histogram of durations in seconds."
+  def __init__(self):
+    self.buckets = {}
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+
+  def add(self, seconds):
+    if seconds > SMALLEST:
+      bucket = int(math.log(seconds / SMALLEST) / math.log(BUCKET_RATIO))
+    else:
+      bucket = 0
+    self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+    self.count += 1
+    self.total += seconds
+    if seconds > self.max: self.max = seconds
+
+  def merge(self, other):
+    for bucket, n in other.buckets.items():
+      self.buckets[bucket] = self.buckets.get(bucket, 0) + n
+    self.count += other.count
+    self.total += other.total
+    self.max = max(self.max, other.max)
+
+  def percentile(self, p):
+    "Upper edge of the bucket holding the p-th percentile (0 < p <= 100)."
+    if self.count == 0: return 0.0
+    rank = math.ceil(self.count * p / 100.0)
+    seen = 0
+    for bucket in sorted(self.buckets):
+      seen += self.buckets[bucket]
+      if seen >= rank:
+        return min(self.max, SMALLEST * BUCKET_RATIO ** (bucket + 1))
+    return self.max
+
+  def summary(self):
+    "Times in milliseconds."
+    ms = 1000.0
+    return {'count': self.count,
+            'total': self.total * ms,
+            'mean': self.total * ms / self.count if self.count else 0.0,
+            'p50': self.percentile(50) * ms,
+            'p95': self.percentile(95) * ms,
+            'p99': self.percentile(99) * ms,
+            'max': self.max * ms}
+
+class PhaseTimer:
+  "Collects per-phase, per-agent timings over one or more games."
+  def __init__(self, fileName=None):
+    self.fileName = fileName
+    self.histograms = {}  # (phase, agentIndex) -> Histogram
+    self.games = 0
+
+  def record(self, phase, agentIndex, seconds):
+    key = (phase, agentIndex)
+    histogram = self.histograms.get(key)
+    if histogram == None:
+      histogram = self.histograms[key] = Histogram()
+    histogram.add(seconds)
+
+  def gameEnded(self):
+    self.games += 1
+
+  def summary(self):
+    phases = {}
+    for phase in PHASES:
+      agents = [(index, h) for (p, index), h in self.histograms.items() if p == phase]
+      if not agents: continue
+      combined = Histogram()
+      for index, h in agents: combined.merge(h)
+      phases[phase] = {'all': combined.summary(),
+                       'agents': dict([(str(index), h.summary()) for index, h in sorted(agents)])}
+    return {'games': self.games, 'units': 'ms', 'phases': phases}
+
+  def report(self):
+    "A one-line-per-phase text table of the combined timings."
+    lines = ['%-20s %8s %9s %9s %9s %9s %10s' % ('phase (ms)', 'count', 'p50', 'p95', 'p99', 'max', 'total')]
+    phases = self.summary()['phases']
+    for phase in PHASES:
+      if phase not in phases: continue
+      s = phases[phase]['all']
+      lines.append('%-20s %8d %9.3f %9.3f %9.3f %9.3f %10.1f' % (phase, s['count'], s['p50'], s['p95'], s['p99'], s['max'], s['total']))
+    return '\n'.join(lines)
+
+  def write(self, fileName=None):
+    fileName = fileName or self.fileName
+    with open(fileName, 'w') as f:
+      json.dump(self.summary(), f, indent=2, sort_keys=True)
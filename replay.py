@@ -0,0 +1,229 @@
+# replay.py
+# ---------
+# Compact recorded games.
+
+"""
+Recorded games (capture.py --record) in a compact binary format.
+
+A replay file is
+
+  'PCRP', a version byte and a 4-byte little-endian header length
+  the header, a marshalled dict: layout (its text, or None), fingerprint
+      (Layout.fingerprint), seed (None unless the run used a fixed seed),
+      redTeamName, blueTeamName, length, numAgents and startingIndex
+  one byte per record:
+      0x00-0x7f  a move, agentIndex << 3 | action (see ACTIONS)
+      0xf0-0xf7  CRASH | agentIndex: the agent crashed or ran out of time
+      0xfe       KEYFRAME, followed by a 4-byte little-endian length and the
+                 zlib-compressed, marshalled capture.packGameState of the
+                 state after all moves so far
+      0xff       END: the game finished normally
+
+ReplayWriter is a game.GameObserver that writes the file while the game is
+played, flushing every few rounds, so a game that dies leaves a readable
+replay that simply lacks its END byte.  A keyframe is written every
+keyframeEvery moves (100 by default), so Replay.stateAt can jump to any
+move by unpacking the nearest earlier keyframe and playing at most that
+many moves from it.  A 1200-move game with its layout embedded takes about
+4kB.
+
+Version 1 files, which have no keyframes, are still read.
+
+readReplay also reads the pickled replays older versions wrote.
+"""
+
+import struct, marshal, zlib, bisect
+from game import Directions, GameObserver, Agent
+import layout as layoutModule
+
+MAGIC = 'PCRP'
+VERSION = 2
+ACTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+ACTION_CODES = dict([(action, code) for code, action in enumerate(ACTIONS)])
+CRASH = 0xf0
+KEYFRAME = 0xfe
+END = 0xff
+FLUSH_EVERY = 40  # moves
+KEYFRAME_EVERY = 100
+
+class ReplayWriter(GameObserver):
+  """
+  Streams one game to a replay file.  Create one per game and add it with
+  Game.addObserver before the game runs.
+  """
+  def __init__(self, fileName, layout, redTeamName, blueTeamName, seed=None, embedLayout=True, keyframeEvery=KEYFRAME_EVERY):
+    self.fileName = fileName
+    self.layout = layout
+    self.redTeamName = redTeamName
+    self.blueTeamName = blueTeamName
+    self.seed = seed
+    self.embedLayout = embedLayout
+    self.keyframeEvery = keyframeEvery
+    self.file = None
+    self.buffer = bytearray()
+    self.moves = 0
+
+  def gameStarted(self, game):
+    header = marshal.dumps({'layout': self.embedLayout and '\n'.join(self.layout.layoutText) or None,
+                            'fingerprint': self.layout.fingerprint(),
+                            'seed': self.seed,
+                            'redTeamName': self.redTeamName,
+                            'blueTeamName': self.blueTeamName,
+                            'length': game.length,
+                            'numAgents': len(game.agents),
+                            'startingIndex': game.startingIndex}, 2)
+    self.file = open(self.fileName, 'wb')
+    self.file.write(MAGIC + struct.pack('<BI', VERSION, len(header)) + header)
+    self.file.flush()
+
+  def postSuccessor(self, game, agentIndex, action, state):
+    self.buffer.append(agentIndex << 3 | ACTION_CODES[action])
+    self.moves += 1
+    if self.keyframeEvery and self.moves % self.keyframeEvery == 0:
+      import capture
+      packed = zlib.compress(marshal.dumps(capture.packGameState(state), 2))
+      self.buffer.append(KEYFRAME)
+      self.buffer.extend(struct.pack('<I', len(packed)) + packed)
+    if len(self.buffer) >= FLUSH_EVERY: self.flush()
+
+  def agentCrashed(self, game, agentIndex):
+    self.buffer.append(CRASH | agentIndex)
+    self.flush()
+
+  agentTimedOut = agentCrashed
+
+  def gameEnded(self, game):
+    if self.file == None: return
+    if game.gameOver: self.buffer.append(END)
+    self.flush()
+    self.file.close()
+    self.file = None
+
+  def flush(self):
+    if self.file == None: return
+    self.file.write(self.buffer)
+    self.file.flush()
+    del self.buffer[:]
+
+class Replay:
+  """
+  A recorded game.  actions holds (agentIndex, action) pairs in the order
+  they were played, with action None where the agent crashed; complete is
+  False if the recording stops before the game ended.  keyframes maps a
+  number of records to the packed state after them.
+  """
+  def __init__(self, layout, actions, length, redTeamName, blueTeamName, seed=None, startingIndex=None, complete=True, keyframes=None):
+    self.layout = layout
+    self.actions = actions
+    self.keyframes = keyframes or {}
+    self.keyframeMoves = sorted(self.keyframes)
+    self.length = length
+    self.redTeamName = redTeamName
+    self.blueTeamName = blueTeamName
+    self.seed = seed
+    self.startingIndex = startingIndex
+    self.complete = complete
+    self.numAgents = len(layout.agentPositions)
+
+  def agents(self):
+    "Stand-ins for the agents, as Game wants one per player."
+    return [Agent(i) for i in range(self.numAgents)]
+
+  def initialState(self):
+    import capture
+    state = capture.GameState()
+    state.initialize(self.layout, self.numAgents)
+    state.data.timeleft = self.length
+    return state
+
+  def stateAt(self, move):
+    """
+    The GameState after the first move records (0 for the initial state),
+    resimulated from the nearest keyframe at or before it.
+    """
+    import capture
+    if move < 0 or move > len(self.actions):
+      raise IndexError('Move %d is outside the replay (0-%d)' % (move, len(self.actions)))
+    i = bisect.bisect_right(self.keyframeMoves, move)
+    if i == 0:
+      start, state = 0, self.initialState()
+    else:
+      start = self.keyframeMoves[i - 1]
+      packed = marshal.loads(zlib.decompress(self.keyframes[start]))
+      state = capture.unpackGameState(packed, self.layout)
+    for record in self.actions[start:move]:
+      state = applyRecord(state, *record)
+    return state
+
+  def states(self, start=0, stop=None):
+    "Yields (move, state) for every move from start to stop (the end by default), inclusive."
+    if stop == None: stop = len(self.actions)
+    state = self.stateAt(start)
+    yield start, state
+    for move in range(start, stop):
+      state = applyRecord(state, *self.actions[move])
+      yield move + 1, state
+
+def applyRecord(state, agentIndex, action):
+  "The state after one record of a replay."
+  if action == None:
+    import capture
+    state = capture.GameState(state)
+    state.data.score = [-1, 1][agentIndex % 2]  # as CaptureRules.agentCrash
+    return state
+  return state.generateSuccessor(agentIndex, action)
+
+def findLayout(fingerprint):
+  "The layout file with this fingerprint, or None."
+  return layoutModule.REGISTRY.findByFingerprint(fingerprint)
+
+def readReplay(fileName):
+  "Reads a Replay from a file in either format."
+  with open(fileName, 'rb') as f:
+    data = f.read()
+  if not data.startswith(MAGIC):
+    import cPickle
+    try:
+      recorded = cPickle.loads(data)
+    except Exception:
+      raise Exception('%s is not a replay file' % fileName)
+    return Replay(recorded['layout'], list(recorded['actions']), recorded['length'],
+                  recorded['redTeamName'], recorded['blueTeamName'])
+
+  version, headerLength = struct.unpack_from('<BI', data, len(MAGIC))
+  if version not in (1, VERSION):
+    raise Exception('%s is a version %d replay; only versions 1 and %d are supported' % (fileName, version, VERSION))
+  start = len(MAGIC) + struct.calcsize('<BI')
+  header = marshal.loads(data[start:start + headerLength])
+  if header['layout'] != None:
+    layout = layoutModule.Layout(header['layout'].split('\n'))
+  else:
+    layout = findLayout(header['fingerprint'])
+    if layout == None:
+      raise Exception('The layout of %s (fingerprint %s) cannot be found' % (fileName, header['fingerprint']))
+
+  actions = []
+  keyframes = {}
+  complete = False
+  records = bytearray(data)
+  i = start + headerLength
+  while i < len(records):
+    byte = records[i]
+    i += 1
+    if byte == END:
+      complete = True
+      break
+    elif byte == KEYFRAME:
+      if i + 4 > len(records): break
+      size, = struct.unpack_from('<I', data, i)
+      if i + 4 + size > len(records): break  # cut off mid-keyframe
+      keyframes[len(actions)] = data[i + 4:i + 4 + size]
+      i += 4 + size
+    elif byte >= CRASH:
+      actions.append((byte & 0x07, None))
+    else:
+      actions.append((byte >> 3, ACTIONS[byte & 7]))
+  replay = Replay(layout, actions, header['length'], header['redTeamName'], header['blueTeamName'],
+                  header['seed'], header['startingIndex'], complete, keyframes)
+  replay.numAgents = header['numAgents']
+  return replay
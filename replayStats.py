@@ -0,0 +1,167 @@
+# replayStats.py
+# --------------
+# Per-game statistics from a directory of recorded games.
+
+"""
+Headless replay analysis.
+
+Resimulates recorded games (see replay.py) without agents or a display and
+writes one row of statistics per game:
+
+  score, winner, moves, complete   the outcome and how much was recorded
+  timeline                         (move, score) at every score change
+  eaten, returned                  food eaten and food brought home, per agent
+  deaths                           times each agent was eaten
+  pacmanMoves, ghostMoves          moves each agent made on the enemy side
+                                   and on its own side
+  capsules                         (move, agent) for every capsule eaten
+
+Only generateSuccessor is run, so a game takes a few dozen milliseconds
+instead of the seconds agents spend on it, and files are spread over a
+process pool.  Rows are written as they arrive, in file order, as CSV (lists
+flattened to space-separated move:value pairs) and/or JSONL.
+
+Example:
+  python replayStats.py replays/ -j 4 --csv stats.csv --jsonl stats.jsonl
+"""
+
+import sys, os, csv, json
+import multiprocessing, itertools
+import replay, eventLog
+
+NUM_AGENTS = 4
+
+def gameStats(recorded):
+  "The statistics of one Replay, as a dict."
+  state = recorded.initialState()
+  n = recorded.numAgents
+  eaten, deaths = [0] * n, [0] * n
+  pacmanMoves, ghostMoves = [0] * n, [0] * n
+  capsules = []
+  timeline = [(0, 0)]
+  for move, (agentIndex, action) in enumerate(recorded.actions):
+    if action == None:
+      state = recorded.stateAt(move + 1)  # the crash decides the score
+      timeline.append((move + 1, state.data.score))
+      break
+    before = eventLog.agentSnapshot(state)
+    state = state.generateSuccessor(agentIndex, action)
+    for event in eventLog.moveEvents(before, state, agentIndex, action):
+      if event['event'] == 'eat': eaten[agentIndex] += 1
+      elif event['event'] == 'death': deaths[event['agent']] += 1
+      elif event['event'] == 'capsule': capsules.append((move + 1, agentIndex))
+    if state.data.agentStates[agentIndex].isPacman:
+      pacmanMoves[agentIndex] += 1
+    else:
+      ghostMoves[agentIndex] += 1
+    if state.data.score != timeline[-1][1]:
+      timeline.append((move + 1, state.data.score))
+
+  score = state.data.score
+  return {'red': recorded.redTeamName,
+          'blue': recorded.blueTeamName,
+          'layout': recorded.layout.fingerprint(),
+          'moves': len(recorded.actions),
+          'complete': recorded.complete,
+          'score': score,
+          'winner': ['Blue', 'Tie', 'Red'][cmp(score, 0) + 1],
+          'timeline': timeline,
+          'eaten': eaten,
+          'returned': [agentState.numReturned for agentState in state.data.agentStates],
+          'deaths': deaths,
+          'pacmanMoves': pacmanMoves,
+          'ghostMoves': ghostMoves,
+          'capsules': capsules}
+
+def analyzeFile(fileName):
+  "Runs in the pool: the statistics of one replay file, or the error reading it."
+  try:
+    stats = gameStats(replay.readReplay(fileName))
+  except Exception, e:
+    stats = {'error': '%s: %s' % (type(e).__name__, e)}
+  stats['file'] = fileName
+  return stats
+
+PER_AGENT = ['eaten', 'returned', 'deaths', 'pacmanMoves', 'ghostMoves']
+COLUMNS = (['file', 'red', 'blue', 'layout', 'moves', 'complete', 'score', 'winner'] +
+           ['%s%d' % (name, i) for name in PER_AGENT for i in range(NUM_AGENTS)] +
+           ['capsules', 'timeline', 'error'])
+
+def csvRow(stats):
+  row = dict([(key, stats[key]) for key in COLUMNS if key in stats and key not in PER_AGENT])
+  for name in PER_AGENT:
+    for i, value in enumerate(stats.get(name, [])):
+      row['%s%d' % (name, i)] = value
+  for name in ['capsules', 'timeline']:
+    if name in stats:
+      row[name] = ' '.join(['%d:%d' % pair for pair in stats[name]])
+  return row
+
+def replayFiles(paths):
+  "The files named, with directories expanded to the files in them, sorted."
+  files = []
+  for path in paths:
+    if os.path.isdir(path):
+      files += sorted([os.path.join(path, name) for name in os.listdir(path)
+                       if os.path.isfile(os.path.join(path, name))])
+    else:
+      files.append(path)
+  return files
+
+def analyze(files, numWorkers=1, csvFile=None, jsonlFile=None, chunkSize=8):
+  """
+  Writes the statistics of every file as they are computed and returns
+  (games analyzed, files that could not be read).
+  """
+  csvWriter = None
+  if csvFile:
+    csvOut = open(csvFile, 'wb')
+    csvWriter = csv.DictWriter(csvOut, COLUMNS)
+    csvWriter.writerow(dict(zip(COLUMNS, COLUMNS)))
+  jsonOut = jsonlFile and open(jsonlFile, 'w')
+
+  pool = None
+  if numWorkers > 1:
+    pool = multiprocessing.Pool(numWorkers)
+    results = pool.imap(analyzeFile, files, chunkSize)
+  else:
+    results = itertools.imap(analyzeFile, files)
+  games, failed = 0, 0
+  try:
+    for stats in results:
+      if 'error' in stats:
+        failed += 1
+        print >>sys.stderr, '%s: %s' % (stats['file'], stats['error'])
+      else:
+        games += 1
+      if csvWriter: csvWriter.writerow(csvRow(stats))
+      if jsonOut: jsonOut.write(json.dumps(stats, sort_keys=True) + '\n')
+  finally:
+    if pool != None:
+      pool.terminate()
+      pool.join()
+    if csvWriter: csvOut.close()
+    if jsonOut: jsonOut.close()
+  return games, failed
+
+def readCommand(argv):
+  from optparse import OptionParser
+  import capture
+  parser = OptionParser('python replayStats.py [options] REPLAY_OR_DIRECTORY...')
+  parser.add_option('-j', '--workers', type='int', help=capture.default('Number of processes'),
+                    default=multiprocessing.cpu_count())
+  parser.add_option('--csv', default=None, metavar='FILE', help='Write the statistics to FILE as CSV')
+  parser.add_option('--jsonl', default=None, metavar='FILE', help='Write the statistics to FILE as JSON lines')
+  options, paths = parser.parse_args(argv)
+  if not paths: parser.error('No replays given')
+  if not options.csv and not options.jsonl: parser.error('Give --csv, --jsonl or both')
+  return options, paths
+
+if __name__ == '__main__':
+  import time
+  options, paths = readCommand(sys.argv[1:])
+  files = replayFiles(paths)
+  start = time.time()
+  games, failed = analyze(files, options.workers, options.csv, options.jsonl)
+  elapsed = time.time() - start
+  print 'Analyzed %d games in %.1f s (%.1f games/s); %d files could not be read' % (games, elapsed, games / max(elapsed, 1e-9), failed)
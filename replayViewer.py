@@ -0,0 +1,286 @@
+# replayViewer.py
+# ---------------
+# Turns recorded games into stand-alone HTML pages.
+
+"""
+Static replay viewer.
+
+  python replayViewer.py replays/replay-0 -o game.html
+  python replayViewer.py replays/*            (writes replays/replay-N.html)
+
+Each page is a single HTML file with no outside references: the board is
+drawn on a canvas by a few lines of inline JavaScript, with a scrubber,
+play/pause, single steps and a speed control (space, arrow keys, Home and
+End work too).  It opens from disk or from any static web server, next to
+contest.html for example.
+
+The game is resimulated here, in Python, and embedded as JSON: the layout,
+the initial agents and one record per move holding only what the move
+changed,
+
+  [score, [agent, x, y, flags, ...], [x, y, ...], [x, y, ...]]
+
+that is the score after the move, the agents whose position or mode
+changed (flags: 1 Pacman, 2 scared), the food that appeared or
+disappeared, and the capsules that were eaten, with empty trailing lists
+left out.  The stream of a whole game comes to 15-20kB and its page to
+about 25kB.  The page keeps a copy of the board every SNAPSHOT_EVERY moves
+so that scrubbing only replays a few records.
+"""
+
+import sys, os, json
+import replay
+
+SNAPSHOT_EVERY = 50
+
+def agentSnapshot(data):
+  "(x, y, flags) per agent, as the stream encodes them."
+  agents = []
+  for agentState in data.agentStates:
+    x, y = agentState.getPosition()
+    agents.append((int(x), int(y), int(agentState.isPacman) | int(agentState.scaredTimer > 0) << 1))
+  return agents
+
+def moveStream(recorded):
+  "The game of a Replay as the JSON-ready dict the page reads."
+  state = recorded.initialState()
+  data = state.data
+  width, height = recorded.layout.width, recorded.layout.height
+  board = []
+  for y in range(height - 1, -1, -1):
+    board.append(''.join([data.layout.walls[x][y] and '%' or data.food[x][y] and '.' or ' '
+                          for x in range(width)]))
+  agents = agentSnapshot(data)
+  food = [column[:] for column in data.food.data]
+  capsules = set(data.capsules)
+  stream = {'width': width, 'height': height, 'board': board,
+            'capsules': sorted(capsules), 'agents': agents,
+            'red': recorded.redTeamName, 'blue': recorded.blueTeamName,
+            'length': recorded.length, 'complete': recorded.complete,
+            'snapshotEvery': SNAPSHOT_EVERY, 'moves': []}
+
+  moves = recorded.states()
+  moves.next()  # the initial state, already in board and agents
+  for move, state in moves:
+    data = state.data
+    record = [data.score, [], [], []]
+    now = agentSnapshot(data)
+    for i, agent in enumerate(now):
+      if agent != agents[i]: record[1].extend((i,) + agent)
+    agents = now
+    for x, column in enumerate(data.food.data):
+      if column != food[x]:
+        for y in range(height):
+          if column[y] != food[x][y]: record[2].extend((x, y))
+        food[x] = column[:]
+    if len(data.capsules) != len(capsules):
+      for capsule in capsules - set(data.capsules): record[3].extend(capsule)
+      capsules = set(data.capsules)
+    while len(record) > 1 and record[-1] == []: record.pop()
+    stream['moves'].append(record)
+  return stream
+
+def viewerPage(recorded, title):
+  "The HTML of the viewer page for a Replay."
+  game = json.dumps(moveStream(recorded), separators=(',', ':')).replace('</', '<\\/')
+  title = title.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+  return PAGE.replace('@TITLE@', title).replace('@GAME@', game)
+
+def writeViewer(replayFile, htmlFile):
+  recorded = replay.readReplay(replayFile)
+  title = '%s vs %s (%s)' % (recorded.redTeamName, recorded.blueTeamName, os.path.basename(replayFile))
+  with open(htmlFile, 'w') as f:
+    f.write(viewerPage(recorded, title))
+
+PAGE = r"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>@TITLE@</title>
+<style>
+body { background: #222; color: #ddd; font-family: sans-serif; margin: 16px; }
+h1 { font-size: 16px; font-weight: normal; }
+.red { color: #e63030; } .blue { color: #3080ff; }
+canvas { display: block; background: #000; margin: 8px 0; }
+#controls button { min-width: 40px; }
+#scrubber { width: 100%; }
+#info { font-family: monospace; margin-top: 6px; }
+</style>
+</head>
+<body>
+<h1><span class="red" id="redName"></span> vs <span class="blue" id="blueName"></span></h1>
+<canvas id="board"></canvas>
+<input type="range" id="scrubber" min="0" value="0">
+<div id="controls">
+<button id="first" title="Home">|&lt;</button>
+<button id="back" title="Left arrow">&lt;</button>
+<button id="play" title="Space">Play</button>
+<button id="forward" title="Right arrow">&gt;</button>
+<button id="last" title="End">&gt;|</button>
+<select id="speed">
+<option value="10">10 moves/s</option>
+<option value="30" selected>30 moves/s</option>
+<option value="100">100 moves/s</option>
+<option value="300">300 moves/s</option>
+</select>
+</div>
+<div id="info"></div>
+<script>
+var GAME = @GAME@;
+(function() {
+  var W = GAME.width, H = GAME.height, MOVES = GAME.moves;
+  var CELL = Math.max(8, Math.min(24, Math.floor(960 / W)));
+  var TEAM = ['#e63030', '#3080ff'], GHOSTS = ['#e63030', '#3080ff', '#fa6912', '#1abfb3'];
+  var canvas = document.getElementById('board'), ctx = canvas.getContext('2d');
+  canvas.width = W * CELL; canvas.height = H * CELL;
+  var scrubber = document.getElementById('scrubber'), info = document.getElementById('info');
+  var playButton = document.getElementById('play'), speed = document.getElementById('speed');
+  document.getElementById('redName').textContent = GAME.red;
+  document.getElementById('blueName').textContent = GAME.blue;
+  scrubber.max = MOVES.length;
+
+  function initial() {
+    var food = new Uint8Array(W * H), capsules = {};
+    for (var row = 0; row < H; row++)
+      for (var x = 0; x < W; x++)
+        if (GAME.board[row].charAt(x) == '.') food[x * H + H - 1 - row] = 1;
+    GAME.capsules.forEach(function(c) { capsules[c[0] * H + c[1]] = 1; });
+    return {move: 0, score: 0, food: food, capsules: capsules,
+            agents: GAME.agents.map(function(a) { return a.slice(); })};
+  }
+  function copy(s) {
+    var capsules = {};
+    for (var k in s.capsules) capsules[k] = 1;
+    return {move: s.move, score: s.score, food: new Uint8Array(s.food), capsules: capsules,
+            agents: s.agents.map(function(a) { return a.slice(); })};
+  }
+  function apply(s, record) {
+    var i, changed;
+    s.score = record[0];
+    changed = record[1] || [];
+    for (i = 0; i < changed.length; i += 4) s.agents[changed[i]] = changed.slice(i + 1, i + 4);
+    changed = record[2] || [];
+    for (i = 0; i < changed.length; i += 2) s.food[changed[i] * H + changed[i + 1]] ^= 1;
+    changed = record[3] || [];
+    for (i = 0; i < changed.length; i += 2) delete s.capsules[changed[i] * H + changed[i + 1]];
+    s.move++;
+  }
+
+  // A copy of the board every snapshotEvery moves, so seeking replays few records
+  var snapshots = [], state = initial();
+  for (var m = 0; m <= MOVES.length; m++) {
+    if (m % GAME.snapshotEvery == 0) snapshots.push(copy(state));
+    if (m < MOVES.length) apply(state, MOVES[m]);
+  }
+  function seek(move) {
+    move = Math.max(0, Math.min(MOVES.length, move));
+    if (move < state.move || move - state.move > GAME.snapshotEvery)
+      state = copy(snapshots[Math.floor(move / GAME.snapshotEvery)]);
+    while (state.move < move) apply(state, MOVES[state.move]);
+    draw();
+  }
+
+  function circle(cx, cy, r, color) {
+    ctx.fillStyle = color;
+    ctx.beginPath(); ctx.arc(cx, cy, r, 0, 2 * Math.PI); ctx.fill();
+  }
+  function draw() {
+    var x, y, row;
+    ctx.fillStyle = '#000'; ctx.fillRect(0, 0, canvas.width, canvas.height);
+    for (row = 0; row < H; row++)
+      for (x = 0; x < W; x++)
+        if (GAME.board[row].charAt(x) == '%') {
+          ctx.fillStyle = '#0033ff'; ctx.fillRect(x * CELL, row * CELL, CELL, CELL);
+        }
+    var dot = Math.max(2, Math.floor(CELL / 5));
+    for (x = 0; x < W; x++)
+      for (y = 0; y < H; y++)
+        if (state.food[x * H + y]) {
+          ctx.fillStyle = TEAM[x < W / 2 ? 0 : 1];
+          ctx.fillRect(x * CELL + (CELL - dot) / 2, (H - 1 - y) * CELL + (CELL - dot) / 2, dot, dot);
+        }
+    for (var k in state.capsules)
+      circle((Math.floor(k / H) + 0.5) * CELL, (H - 1 - k % H + 0.5) * CELL, CELL / 4, '#fff');
+    state.agents.forEach(function(a, i) {
+      var cx = (a[0] + 0.5) * CELL, cy = (H - 1 - a[1] + 0.5) * CELL, r = CELL * 0.45;
+      if (a[2] & 1) {
+        circle(cx, cy, r, TEAM[i % 2]);
+        circle(cx, cy, r - Math.max(1, CELL / 8), '#ffff3d');
+      } else {
+        var color = a[2] & 2 ? '#fff' : GHOSTS[i % GHOSTS.length];
+        circle(cx, cy, r, color);
+        ctx.fillRect(cx - r, cy, 2 * r, r);
+      }
+    });
+    scrubber.value = state.move;
+    var winner = state.score > 0 ? 'Red' : state.score < 0 ? 'Blue' : 'Tie';
+    var end = state.move == MOVES.length ? (GAME.complete ? '   final: ' + winner : '   (recording ends here)') : '';
+    info.textContent = 'move ' + state.move + '/' + MOVES.length + '   time left ' + (GAME.length - state.move) +
+                       '   score ' + state.score + end;
+  }
+
+  var timer = null, last = 0, carry = 0;
+  function tick(now) {
+    if (timer == null) return;
+    carry += (now - last) * speed.value / 1000;
+    last = now;
+    var steps = Math.floor(carry);
+    carry -= steps;
+    if (steps) seek(state.move + steps);
+    if (state.move >= MOVES.length) { stop(); return; }
+    timer = requestAnimationFrame(tick);
+  }
+  function play() {
+    if (state.move >= MOVES.length) seek(0);
+    playButton.textContent = 'Pause';
+    last = performance.now(); carry = 0;
+    timer = requestAnimationFrame(tick);
+  }
+  function stop() {
+    if (timer != null) cancelAnimationFrame(timer);
+    timer = null;
+    playButton.textContent = 'Play';
+  }
+  function toggle() { if (timer == null) play(); else stop(); }
+  function step(delta) { stop(); seek(state.move + delta); }
+
+  playButton.onclick = toggle;
+  document.getElementById('first').onclick = function() { step(-MOVES.length); };
+  document.getElementById('back').onclick = function() { step(-1); };
+  document.getElementById('forward').onclick = function() { step(1); };
+  document.getElementById('last').onclick = function() { step(MOVES.length); };
+  scrubber.oninput = function() { stop(); seek(parseInt(scrubber.value, 10)); };
+  document.onkeydown = function(e) {
+    if (e.target == scrubber || e.target == speed) return;
+    if (e.key == ' ') toggle();
+    else if (e.key == 'ArrowLeft') step(-1);
+    else if (e.key == 'ArrowRight') step(1);
+    else if (e.key == 'Home') step(-MOVES.length);
+    else if (e.key == 'End') step(MOVES.length);
+    else return;
+    e.preventDefault();
+  };
+  state = copy(snapshots[0]);
+  draw();
+})();
+</script>
+</body>
+</html>
+"""
+
+def readCommand(argv):
+  from optparse import OptionParser
+  parser = OptionParser('python replayViewer.py [options] REPLAY...')
+  parser.add_option('-o', '--output', default=None, metavar='FILE',
+                    help='Where to write the page when one replay is given [Default: REPLAY.html]')
+  options, replayFiles = parser.parse_args(argv)
+  if not replayFiles: parser.error('No replays given')
+  if options.output and len(replayFiles) > 1: parser.error('-o takes a single replay')
+  return options, replayFiles
+
+if __name__ == '__main__':
+  options, replayFiles = readCommand(sys.argv[1:])
+  for replayFile in replayFiles:
+    htmlFile = options.output or os.path.splitext(replayFile)[0] + '.html'
+    writeViewer(replayFile, htmlFile)
+    print 'Wrote %s (%d bytes)' % (htmlFile, os.path.getsize(htmlFile))
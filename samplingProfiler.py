@@ -0,0 +1,108 @@
+# samplingProfiler.py
+# -------------------
+# A low-overhead statistical profiler for whole batches of games.
+
+"""
+Sampling profiler built on SIGPROF.
+
+cProfile slows agents down so much that they start hitting their time
+limits.  This profiler instead asks the kernel for a SIGPROF every few
+milliseconds of CPU time (signal.setitimer(ITIMER_PROF)) and records the
+Python stack that was running, which costs a few microseconds per sample.
+
+  python capture.py -q -n 20 --sample-profile profile.txt
+
+Samples are aggregated by function (self and inclusive counts) and by
+agent: a sample belongs to an agent when one of its frames is a method
+called on that agent object, otherwise to the engine.  The report is
+written when the batch ends.
+
+ITIMER_PROF counts CPU time of this process only, so time spent sleeping,
+waiting on a sandboxed agent's process or drawing in Tk's event loop is
+not sampled.
+"""
+
+import signal, inspect, os
+
+class SamplingProfiler:
+  def __init__(self, interval=0.005, fileName=None):
+    self.interval = interval
+    self.fileName = fileName
+    self.samples = 0
+    self.selfCounts = {}
+    self.inclusiveCounts = {}
+    self.ownerCounts = {}
+    self.agentLabels = {}   # id(agent) -> label
+    self.agentFiles = set() # base names, as co_filename depends on how a file was loaded
+    self.isAgentCode = {}   # code object -> bool
+    self.oldHandler = None
+
+  def registerAgents(self, agents):
+    "Lets samples taken inside agent code be attributed to the agent."
+    for agent in agents:
+      if agent == None: continue
+      fileName = inspect.getsourcefile(agent.__class__) or '?'
+      self.agentLabels[id(agent)] = '%s (agent %d)' % (os.path.basename(fileName), agent.index)
+      for cls in inspect.getmro(agent.__class__):
+        try:
+          self.agentFiles.add(os.path.basename(inspect.getsourcefile(cls)))
+        except TypeError:
+          pass
+    # game.Agent's own methods are not agent code
+    self.agentFiles.discard('game.py')
+    self.isAgentCode.clear()
+
+  def start(self):
+    self.oldHandler = signal.signal(signal.SIGPROF, self._sample)
+    signal.siginterrupt(signal.SIGPROF, False)
+    signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+  def stop(self):
+    signal.setitimer(signal.ITIMER_PROF, 0)
+    if self.oldHandler != None:
+      signal.signal(signal.SIGPROF, self.oldHandler)
+      self.oldHandler = None
+
+  def _sample(self, signum, frame):
+    self.samples += 1
+    owner = None
+    stack = []
+    while frame != None:
+      code = frame.f_code
+      stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+      if owner == None:
+        isAgentCode = self.isAgentCode.get(code)
+        if isAgentCode == None:
+          isAgentCode = self.isAgentCode[code] = os.path.basename(code.co_filename) in self.agentFiles
+        if isAgentCode:
+          owner = self.agentLabels.get(id(frame.f_locals.get('self')))
+      frame = frame.f_back
+    if not stack: return
+    self.selfCounts[stack[0]] = self.selfCounts.get(stack[0], 0) + 1
+    for func in set(stack):
+      self.inclusiveCounts[func] = self.inclusiveCounts.get(func, 0) + 1
+    owner = owner or 'engine'
+    self.ownerCounts[owner] = self.ownerCounts.get(owner, 0) + 1
+
+  def report(self, top=25):
+    if self.samples == 0: return 'No samples were taken.'
+    def label(func):
+      fileName, line, name = func
+      return '%s:%d(%s)' % (os.path.basename(fileName), line, name)
+    def percent(n):
+      return 100.0 * n / self.samples
+    lines = ['%d samples, %.1f ms apart (about %.2f s of CPU time)' %
+             (self.samples, self.interval * 1000, self.samples * self.interval), '',
+             'By agent:']
+    for owner, n in sorted(self.ownerCounts.items(), key=lambda item: -item[1]):
+      lines.append('  %6.2f%% %8d  %s' % (percent(n), n, owner))
+    for title, counts in [('self', self.selfCounts), ('inclusive', self.inclusiveCounts)]:
+      lines += ['', 'Top functions by %s samples:' % title]
+      for func, n in sorted(counts.items(), key=lambda item: -item[1])[:top]:
+        lines.append('  %6.2f%% %8d  %s' % (percent(n), n, label(func)))
+    return '\n'.join(lines)
+
+  def write(self, fileName=None):
+    fileName = fileName or self.fileName
+    with open(fileName, 'w') as f:
+      f.write(self.report() + '\n')
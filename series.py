@@ -0,0 +1,278 @@
+# series.py
+# ---------
+# Plays a series of games between two teams and stops as soon as the result
+# is statistically clear.
+
+"""
+Early-stopping match series for capture the flag.
+
+Instead of a fixed 'capture.py -n 200', games are played (in parallel on a
+pool of warm agent hosts if asked, see agentHost.py) until a sequential
+test decides:
+
+  sprt     Wald's sequential probability ratio test on the probability
+           that team A wins a decisive game, H0: p = p0 against H1: p = p1.
+  winrate  an anytime-valid confidence bound on that win probability,
+           stopping once it excludes the threshold (0.5 by default).
+  score    an anytime-valid confidence bound on A's mean score, stopping
+           once it excludes the threshold (0 by default).  The bound is a
+           normal approximation, so it plays at least MIN_SCORE_GAMES
+           games and uses a variance of at least SCORE_VARIANCE_FLOOR.
+
+The confidence bounds spend alpha / (n * (n + 1)) at the n-th look, so
+checking after every game keeps the overall error rate below alpha.
+Results are fed to the test in the order the games were started, not the
+order they finish, so short (often lopsided) games cannot bias the test.
+
+Example:
+  python series.py -a baselineTeam -b greymon -l defaultCapture,RANDOM -j 4
+"""
+
+import sys, math, random
+import Queue
+import capture, util
+from agentHost import AgentHostPool
+
+MIN_SCORE_GAMES = 10
+SCORE_VARIANCE_FLOOR = 1.0
+
+def normalQuantile(p):
+  """
+  Inverse of the standard normal CDF: Acklam's rational approximation,
+  refined by one step of Halley's method.
+  """
+  a = [-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+       1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00]
+  b = [-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+       6.680131188771972e+01, -1.328068155288572e+01]
+  c = [-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+       -2.549671010739305e+00, 4.374664141464968e+00, 2.938163982698783e+00]
+  d = [7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+       3.754408661907416e+00]
+  if p > 1 - 0.02425:
+    return -normalQuantile(1 - p)
+  if p < 0.02425:
+    q = math.sqrt(-2 * math.log(p))
+    x = (((((c[0]*q+c[1])*q+c[2])*q+c[3])*q+c[4])*q+c[5]) / ((((d[0]*q+d[1])*q+d[2])*q+d[3])*q+1)
+  else:
+    q = p - 0.5
+    r = q * q
+    x = (((((a[0]*r+a[1])*r+a[2])*r+a[3])*r+a[4])*r+a[5])*q / (((((b[0]*r+b[1])*r+b[2])*r+b[3])*r+b[4])*r+1)
+  # The approximation is off by about 1e-5 in the tails; the step fixes that
+  e = 0.5 * math.erfc(-x / math.sqrt(2)) - p
+  u = e * math.sqrt(2 * math.pi) * math.exp(x * x / 2)
+  return x - u / (1 + x * u / 2)
+
+def wilsonInterval(wins, n, alpha):
+  "Two-sided Wilson score interval for a binomial proportion."
+  if n == 0: return 0.0, 1.0
+  z = normalQuantile(1 - alpha / 2)
+  p = wins / float(n)
+  center = (p + z * z / (2 * n)) / (1 + z * z / n)
+  half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+  return max(0.0, center - half), min(1.0, center + half)
+
+class SequentialTest:
+  """
+  Accumulates game scores (from team A's point of view) and decides when
+  the series can stop.  decision() returns None to keep playing, or a
+  short description of the conclusion.
+  """
+  def __init__(self, alpha, minGames):
+    self.alpha = alpha
+    self.minGames = minGames
+    self.scores = []
+
+  def add(self, score):
+    self.scores.append(score)
+
+  def wins(self):
+    return len([s for s in self.scores if s > 0])
+
+  def losses(self):
+    return len([s for s in self.scores if s < 0])
+
+  def lookAlpha(self):
+    "The share of alpha spent on the current look (none before the first game)."
+    n = len(self.scores)
+    if n == 0: return 0.0
+    return self.alpha / (n * (n + 1))
+
+  def decision(self):
+    util.raiseNotDefined()
+
+  def interval(self):
+    util.raiseNotDefined()
+
+class WinRateSPRT(SequentialTest):
+  """
+  Wald's SPRT on the probability that A wins a decisive game; ties carry
+  no information and are skipped.
+  """
+  def __init__(self, alpha, beta, p0, p1, minGames):
+    SequentialTest.__init__(self, alpha, minGames)
+    self.p0, self.p1 = p0, p1
+    self.upper = math.log((1 - beta) / alpha)
+    self.lower = math.log(beta / (1 - alpha))
+
+  def llr(self):
+    win = math.log(self.p1 / self.p0)
+    loss = math.log((1 - self.p1) / (1 - self.p0))
+    return self.wins() * win + self.losses() * loss
+
+  def decision(self):
+    if len(self.scores) < self.minGames: return None
+    llr = self.llr()
+    if llr >= self.upper: return 'H1 accepted: A wins with p >= %.3f' % self.p1
+    if llr <= self.lower: return 'H0 accepted: A wins with p <= %.3f' % self.p0
+    return None
+
+  def interval(self):
+    return wilsonInterval(self.wins(), self.wins() + self.losses(), self.alpha)
+
+  def describe(self):
+    return 'LLR %.3f in (%.3f, %.3f)' % (self.llr(), self.lower, self.upper)
+
+class WinRateBound(SequentialTest):
+  "Stops once the anytime confidence bound on A's decisive win rate excludes threshold."
+  def __init__(self, alpha, threshold, minGames):
+    SequentialTest.__init__(self, alpha, minGames)
+    self.threshold = threshold
+
+  def interval(self):
+    if self.wins() + self.losses() == 0: return 0.0, 1.0
+    return wilsonInterval(self.wins(), self.wins() + self.losses(), self.lookAlpha())
+
+  def decision(self):
+    if len(self.scores) < self.minGames or self.wins() + self.losses() == 0: return None
+    low, high = self.interval()
+    if low > self.threshold: return 'A is stronger: win rate > %.3f' % self.threshold
+    if high < self.threshold: return 'B is stronger: A win rate < %.3f' % self.threshold
+    return None
+
+  def describe(self):
+    return 'win rate %d/%d' % (self.wins(), self.wins() + self.losses())
+
+class MeanScoreBound(SequentialTest):
+  """
+  Stops once the anytime confidence bound on A's mean score excludes
+  threshold.  A few equal scores would give a zero-width normal interval,
+  so the bound waits for MIN_SCORE_GAMES games and never takes the
+  variance below SCORE_VARIANCE_FLOOR.
+  """
+  def __init__(self, alpha, threshold, minGames):
+    SequentialTest.__init__(self, alpha, max(minGames, MIN_SCORE_GAMES))
+    self.threshold = threshold
+
+  def interval(self):
+    n = len(self.scores)
+    if n < 2: return float('-inf'), float('inf')
+    mean = sum(self.scores) / float(n)
+    variance = max(SCORE_VARIANCE_FLOOR, sum([(s - mean) ** 2 for s in self.scores]) / (n - 1))
+    half = normalQuantile(1 - self.lookAlpha() / 2) * math.sqrt(variance / n)
+    return mean - half, mean + half
+
+  def decision(self):
+    if len(self.scores) < self.minGames: return None
+    low, high = self.interval()
+    if low > self.threshold: return 'A is stronger: mean score > %g' % self.threshold
+    if high < self.threshold: return 'B is stronger: mean score < %g' % self.threshold
+    return None
+
+  def describe(self):
+    if not self.scores: return 'no games'
+    return 'mean score %.2f' % (sum(self.scores) / float(len(self.scores)))
+
+def runSeries(teamA, teamB, layouts, test, maxGames, length=1200, numWorkers=1,
+              alternateColors=True, catchExceptions=True):
+  """
+  Plays games of teamA against teamB until test decides or maxGames have
+  been played.  Returns (decision, games), where games is the list of
+  (layout, aIsRed, score for A) in the order the games were started.
+  """
+  results = Queue.Queue()
+  pool = AgentHostPool(numWorkers)
+  finished = {}
+  games = []
+  decision = None
+  started = 0
+
+  def startGame():
+    layout = layouts[started % len(layouts)]
+    aIsRed = not alternateColors or started % 2 == 0
+    red, blue = (teamA, teamB) if aIsRed else (teamB, teamA)
+    seed = random.randint(0, 99999999)
+    pool.playGame((started, layout, aIsRed), red, blue, layout, length, catchExceptions, seed,
+                  callback=results.put)
+
+  try:
+    while started < min(numWorkers, maxGames):
+      startGame()
+      started += 1
+    while decision == None and len(games) < maxGames:
+      key, score, error = results.get()
+      index, layout, aIsRed = key
+      if error != None:
+        print >>sys.stderr, 'Game %d failed: %s' % (index, error)
+      finished[index] = (layout, aIsRed, score if aIsRed else -score)
+      if started < maxGames:
+        startGame()
+        started += 1
+      # Feed the test in start order
+      while len(games) in finished and decision == None:
+        game = finished.pop(len(games))
+        games.append(game)
+        test.add(game[2])
+        decision = test.decision()
+  finally:
+    pool.terminate()
+  return decision, games
+
+def readCommand(argv):
+  from optparse import OptionParser
+  parser = OptionParser('python series.py -a TEAM_A -b TEAM_B [options]')
+  parser.add_option('-a', '--teamA', help=capture.default('Team A'), default='baselineTeam')
+  parser.add_option('-b', '--teamB', help=capture.default('Team B'), default='baselineTeam')
+  parser.add_option('-l', '--layouts', help=capture.default('Comma separated layouts, played in rotation'),
+                    default='defaultCapture')
+  parser.add_option('-n', '--maxGames', type='int', help=capture.default('Maximum number of games'), default=200)
+  parser.add_option('-i', '--time', type='int', help=capture.default('TIME limit of a game in moves'), default=1200)
+  parser.add_option('-j', '--workers', type='int', help=capture.default('Number of games played in parallel'), default=1)
+  parser.add_option('--test', type='choice', choices=['sprt', 'winrate', 'score'],
+                    help=capture.default('Stopping rule: sprt, winrate or score'), default='winrate')
+  parser.add_option('--alpha', type='float', help=capture.default('Type I error rate'), default=0.05)
+  parser.add_option('--beta', type='float', help=capture.default('Type II error rate (sprt only)'), default=0.05)
+  parser.add_option('--p0', type='float', help=capture.default('Win probability under H0 (sprt only)'), default=0.5)
+  parser.add_option('--p1', type='float', help=capture.default('Win probability under H1 (sprt only)'), default=0.65)
+  parser.add_option('--threshold', type='float', default=None,
+                    help='Win rate or mean score the bound must exclude [Default: 0.5 for winrate, 0 for score]')
+  parser.add_option('--minGames', type='int', help=capture.default('Games played before the test may stop'), default=4)
+  parser.add_option('--fixedColors', action='store_true', default=False,
+                    help='Always play team A as red instead of alternating colors')
+  parser.add_option('-f', '--fixRandomSeed', action='store_true',
+                    help='Fixes the random seed so RANDOM layouts repeat', default=False)
+  options, otherjunk = parser.parse_args(argv)
+  assert len(otherjunk) == 0, "Unrecognized options: " + str(otherjunk)
+
+  if options.fixRandomSeed: random.seed('cs188')
+  if options.test == 'sprt':
+    test = WinRateSPRT(options.alpha, options.beta, options.p0, options.p1, options.minGames)
+  elif options.test == 'winrate':
+    threshold = options.threshold if options.threshold != None else 0.5
+    test = WinRateBound(options.alpha, threshold, options.minGames)
+  else:
+    threshold = options.threshold if options.threshold != None else 0.0
+    test = MeanScoreBound(options.alpha, threshold, options.minGames)
+  return options, test
+
+if __name__ == '__main__':
+  options, test = readCommand(sys.argv[1:])
+  decision, games = runSeries(options.teamA, options.teamB, options.layouts.split(','), test,
+                              options.maxGames, options.time, options.workers,
+                              not options.fixedColors)
+  low, high = test.interval()
+  print 'Games played:  %d of at most %d' % (len(games), options.maxGames)
+  print 'Record (A):    %d wins, %d losses, %d ties' % (test.wins(), test.losses(), len(games) - test.wins() - test.losses())
+  print 'Statistic:     %s' % test.describe()
+  print 'Interval:      [%.3f, %.3f]' % (low, high)
+  print 'Decision:      %s' % (decision or 'none, game limit reached')
@@ -0,0 +1,86 @@
+# testAgentHost.py
+# ----------------
+# Tests that warm agent hosts play the same games as capture.py.
+
+import os, shutil, sys, tempfile, unittest
+import Queue
+import capture, agentHost, util
+
+TEAM = '''
+from game import Agent
+
+registry = []
+
+class CountingAgent(Agent):
+  def __init__(self, index):
+    Agent.__init__(self, index)
+    registry.append(self)
+
+  def getAction(self, state):
+    return 'Stop'
+
+def createTeam(first, second, isRed):
+  return [CountingAgent(first), CountingAgent(second)]
+'''
+
+class ModuleCacheTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.team = os.path.join(self.directory, 'countingTeam.py')
+    with open(self.team, 'w') as f:
+      f.write(TEAM)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def loadAgents(self, isRed, moduleCache):
+    util.mutePrint()
+    try:
+      return capture.loadAgents(isRed, self.team, True, {}, moduleCache)
+    finally:
+      util.unmutePrint()
+
+  def registry(self, agents):
+    return sys.modules[agents[0].__class__.__module__].registry
+
+  def testModuleStateIsPerGameAndColor(self):
+    moduleCache = {}
+    for game in range(3):
+      red = self.loadAgents(True, moduleCache)
+      blue = self.loadAgents(False, moduleCache)
+      self.assertEqual(self.registry(red), red)
+      self.assertEqual(self.registry(blue), blue)
+    self.assertEqual(moduleCache.keys(), [os.path.abspath(self.team)])
+
+  def testSameModuleNamesAsWithoutACache(self):
+    cold = [self.loadAgents(isRed, None)[0].__class__.__module__ for isRed in [True, False]]
+    warm = [self.loadAgents(isRed, {})[0].__class__.__module__ for isRed in [True, False]]
+    self.assertEqual(cold, warm)
+
+class AgentHostTest(unittest.TestCase):
+  def testWarmScoresMatchColdScores(self):
+    seeds = [1, 2]
+    cold = [capture.runHeadlessGame('baselineTeam', 'baselineTeam', 'tinyCapture', 200, seed=seed) for seed in seeds]
+    host = agentHost.AgentHost()
+    try:
+      warm = [host.play('baselineTeam', 'baselineTeam', 'tinyCapture', 200, seed=seed) for seed in seeds]
+    finally:
+      host.stop()
+    self.assertEqual(warm, [(score, None) for score in cold])
+
+class AgentHostPoolTest(unittest.TestCase):
+  def testCancelledGamesAreNotPlayed(self):
+    results = Queue.Queue()
+    pool = agentHost.AgentHostPool(1)
+    try:
+      for key in range(4):
+        pool.playGame(key, 'baselineTeam', 'baselineTeam', 'tinyCapture', 40, seed=key,
+                      callback=results.put, cancelled=lambda key=key: key in [1, 2])
+      keys = sorted([results.get(timeout=60)[0] for i in range(2)])
+      self.assertEqual(keys, [0, 3])
+      self.assertEqual(pool.gamesPlayed(), 2)
+    finally:
+      pool.terminate()
+
+if __name__ == '__main__':
+  unittest.main()
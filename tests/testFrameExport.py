@@ -0,0 +1,131 @@
+# testFrameExport.py
+# ------------------
+# Tests for the PNG encoder and the renderer of frameExport.py.
+
+import os, shutil, struct, tempfile, unittest, zlib
+import capture, frameExport, layout
+from testReplay import playGame
+
+def readPNG(fileName):
+  "Decodes an 8-bit RGB PNG written by writePNG; returns (width, height, pixels)."
+  with open(fileName, 'rb') as f:
+    data = f.read()
+  assert data[:8] == '\x89PNG\r\n\x1a\n'
+  i = 8
+  chunks = []
+  while i < len(data):
+    length, = struct.unpack_from('>I', data, i)
+    kind = data[i + 4:i + 8]
+    body = data[i + 8:i + 8 + length]
+    crc, = struct.unpack_from('>I', data, i + 8 + length)
+    assert crc == zlib.crc32(kind + body) & 0xffffffff, 'bad CRC in %s' % kind
+    chunks.append((kind, body))
+    i += 12 + length
+  assert [kind for kind, body in chunks] == ['IHDR', 'IDAT', 'IEND']
+  width, height, depth, colorType, compression, filterMethod, interlace = struct.unpack('>IIBBBBB', chunks[0][1])
+  assert (depth, colorType, compression, filterMethod, interlace) == (8, 2, 0, 0, 0)
+  raw = zlib.decompress(chunks[1][1])
+  rowBytes = width * 3 + 1
+  assert len(raw) == height * rowBytes
+  pixels = bytearray()
+  for y in range(height):
+    row = raw[y * rowBytes:(y + 1) * rowBytes]
+    assert row[0] == '\x00', 'row %d is filtered' % y
+    pixels.extend(row[1:])
+  return width, height, pixels
+
+def pixelAt(renderer, x, y):
+  start = (y * renderer.width + x) * 3
+  return tuple(renderer.pixels[start:start + 3])
+
+class PNGTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.fileName = os.path.join(self.directory, 'image.png')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testRoundTrip(self):
+    width, height = 7, 3
+    pixels = bytearray([(x * 37 + y * 11 + c * 5) % 256 for y in range(height) for x in range(width) for c in range(3)])
+    frameExport.writePNG(self.fileName, width, height, pixels)
+    self.assertEqual(readPNG(self.fileName), (width, height, pixels))
+
+  def testSinglePixel(self):
+    frameExport.writePNG(self.fileName, 1, 1, bytearray([255, 0, 128]))
+    self.assertEqual(readPNG(self.fileName), (1, 1, bytearray([255, 0, 128])))
+
+class FrameRendererTest(unittest.TestCase):
+  def setUp(self):
+    self.layout = layout.getLayout('tinyCapture')
+    self.renderer = frameExport.FrameRenderer(self.layout, cellSize=10)
+    self.state = capture.GameState()
+    self.state.initialize(self.layout, len(self.layout.agentPositions))
+    self.state.data.timeleft = 1200
+
+  def cellCenter(self, x, y):
+    left, top = self.renderer.toScreen((x, y))
+    return left + 5, top + 5
+
+  def testSize(self):
+    self.assertEqual(self.renderer.width, self.layout.width * 10)
+    self.assertEqual(self.renderer.height, self.layout.height * 10 + self.renderer.paneHeight)
+    self.assertEqual(len(self.renderer.pixels), self.renderer.width * self.renderer.height * 3)
+
+  def testWallsAndFood(self):
+    self.renderer.render(self.state.data)
+    food = self.state.data.food
+    for x in range(self.layout.width):
+      for y in range(self.layout.height):
+        color = pixelAt(self.renderer, *self.cellCenter(x, y))
+        if self.layout.walls[x][y]:
+          self.assertEqual(color, frameExport.WALL)
+        elif food[x][y]:
+          # Food is coloured by the side it is on, as in capture.py's isRed
+          self.assertEqual(color, frameExport.TEAM_COLORS[int(x >= self.layout.width / 2)])
+
+  def testMiddleColumnFoodIsBlue(self):
+    small = layout.Layout(['%%%%%%', '%1..2%', '%%%%%%'])
+    renderer = frameExport.FrameRenderer(small, cellSize=10)
+    state = capture.GameState()
+    state.initialize(small, 2)
+    state.data.timeleft = 100
+    renderer.render(state.data)
+    for x, color in [(2, frameExport.TEAM_COLORS[0]), (3, frameExport.TEAM_COLORS[1])]:
+      left, top = renderer.toScreen((x, 1))
+      self.assertEqual(pixelAt(renderer, left + 5, top + 5), color)
+
+  def testRenderStartsFromTheBackground(self):
+    first = self.renderer.render(self.state.data)[:]
+    state = self.state.generateSuccessor(0, sorted(self.state.getLegalActions(0))[0])
+    self.renderer.render(state.data)
+    self.assertEqual(self.renderer.render(self.state.data), first)
+
+class ExportFramesTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.replayFile = os.path.join(self.directory, 'replay-0')
+    self.states = playGame(self.replayFile, length=120, keyframeEvery=40)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testFrames(self):
+    output = os.path.join(self.directory, 'frames')
+    written = frameExport.exportFrames(self.replayFile, output, start=10, end=70, every=20, cellSize=8, chunkSize=2)
+    self.assertEqual(written, 4)
+    self.assertEqual(sorted(os.listdir(output)), ['frame_%05d.png' % i for i in range(4)])
+    renderer = frameExport.FrameRenderer(layout.getLayout('tinyCapture'), 8)
+    for frame, move in enumerate([10, 30, 50, 70]):
+      width, height, pixels = readPNG(frameExport.frameName(output, frame))
+      self.assertEqual((width, height), (renderer.width, renderer.height))
+      self.assertEqual(pixels, renderer.render(self.states[move].data))
+
+  def testEndIsClipped(self):
+    output = os.path.join(self.directory, 'frames')
+    written = frameExport.exportFrames(self.replayFile, output, start=len(self.states) - 3, end=10 ** 6)
+    self.assertEqual(written, 3)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,36 @@
+# testGame.py
+# -----------
+# Tests that training games play out like the games they stand in for.
+
+import random, unittest
+import capture, layout, textDisplay, util
+from testReplay import SeededAgent
+
+def playGame(length, training):
+  "Plays a seeded game on tinyCapture; returns the finished game."
+  gameLayout = layout.getLayout('tinyCapture')
+  random.seed(3)
+  agents = [SeededAgent(i, i) for i in range(len(gameLayout.agentPositions))]
+  rules = capture.CaptureRules(quiet=True)
+  util.mutePrint()
+  try:
+    game = rules.newGame(gameLayout, agents, textDisplay.NullGraphics(), length, True, False, training=training)
+    game.run()
+  finally:
+    util.unmutePrint()
+  return game
+
+class TrainingGameTest(unittest.TestCase):
+  def testSameMovesAsANormalGame(self):
+    for length in [1, 40, 201]:
+      normal = playGame(length, False)
+      training = playGame(length, True)
+      self.assertEqual(normal.numMoves, length)
+      self.assertEqual(training.numMoves, normal.numMoves)
+      self.assertEqual(training.state, normal.state)
+      self.assertEqual(training.state.data.score, normal.state.data.score)
+      self.assertEqual(len(normal.moveHistory), length)
+      self.assertEqual(training.moveHistory, [])
+
+if __name__ == '__main__':
+  unittest.main()
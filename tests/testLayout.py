@@ -0,0 +1,132 @@
+# testLayout.py
+# -------------
+# Tests for layout archives and the layout registry.
+
+import os, shutil, tempfile, unittest
+import layout, mazeGenerator
+
+def layoutText(name):
+  return '\n'.join(layout.getLayout(name).layoutText)
+
+class LayoutArchiveTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.fileName = os.path.join(self.directory, 'mazes.pcla')
+    self.texts = [layoutText(name) for name in ['tinyCapture', 'testCapture', 'fastCapture']]
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testLookup(self):
+    mazes = [(seed, self.texts[seed % 3]) for seed in [17, 3, 250, 8, 2 ** 32 - 1, 0]]
+    self.assertEqual(layout.writeArchive(self.fileName, mazes), (3, 6))
+    archive = layout.LayoutArchive(self.fileName)
+    try:
+      self.assertEqual(len(archive), 3)
+      self.assertEqual(archive.seeds(), sorted([seed for seed, text in mazes]))
+      for seed, text in mazes:
+        self.assertEqual(archive.findSeed(seed), text)
+        self.assertEqual(archive.findFingerprint(layout.textFingerprint(text)), text)
+      self.assertEqual(archive.findSeed(4), None)
+      self.assertEqual(archive.findSeed(2 ** 40), None)
+      self.assertEqual(archive.findFingerprint('0' * 16), None)
+    finally:
+      archive.close()
+
+  def testDuplicateMazesAreStoredOnce(self):
+    mazes = [(seed, self.texts[0]) for seed in range(50)] + [(50, self.texts[1])]
+    self.assertEqual(layout.writeArchive(self.fileName, mazes), (2, 51))
+    archive = layout.LayoutArchive(self.fileName)
+    try:
+      self.assertEqual([archive.findSeed(seed) for seed in range(51)], [self.texts[0]] * 50 + [self.texts[1]])
+    finally:
+      archive.close()
+
+  def testRepeatedSeedKeepsItsFirstMaze(self):
+    layout.writeArchive(self.fileName, [(5, self.texts[0]), (5, self.texts[1])])
+    archive = layout.LayoutArchive(self.fileName)
+    try:
+      self.assertEqual(archive.seeds(), [5])
+      self.assertEqual(archive.findSeed(5), self.texts[0])
+    finally:
+      archive.close()
+
+  def testBadSeedsWriteNothing(self):
+    for seed in [-1, 2 ** 32, 'one', 1.5]:
+      self.assertRaises(Exception, layout.writeArchive, self.fileName, [(1, self.texts[0]), (seed, self.texts[1])])
+      self.assertFalse(os.path.exists(self.fileName))
+
+  def testNotAnArchive(self):
+    with open(self.fileName, 'wb') as f:
+      f.write('%' * 64)
+    self.assertRaises(Exception, layout.LayoutArchive, self.fileName)
+
+  def testRegistryUsesArchives(self):
+    layout.writeArchive(self.fileName, [(424242, self.texts[1])])
+    registry = layout.LayoutRegistry()
+    self.assertEqual(registry.get('random424242Capture'), None)
+    registry.addArchive(self.fileName)
+    found = registry.get('random424242Capture')
+    self.assertEqual('\n'.join(found.layoutText), self.texts[1])
+    self.assertTrue(registry.get('random424242Capture') is found)
+    self.assertTrue(registry.findByFingerprint(layout.textFingerprint(self.texts[1])) is found)
+    self.assertEqual(registry.get('random7Capture'), None)
+
+  def testGeneratedMazesRepeat(self):
+    mazes = list(mazeGenerator.generateMazes([0, 1, 0]))
+    self.assertEqual(mazes[0], mazes[2])
+    self.assertNotEqual(mazes[0][1], mazes[1][1])
+    layout.writeArchive(self.fileName, mazes)
+    archive = layout.LayoutArchive(self.fileName)
+    try:
+      self.assertEqual(archive.findSeed(0), mazeGenerator.generateMaze(0))
+    finally:
+      archive.close()
+
+class LayoutRegistryTest(unittest.TestCase):
+  "Runs in an empty directory, as the registry searches the current one first."
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.cwd = os.getcwd()
+    os.chdir(self.directory)
+    os.mkdir('layouts')
+    self.text = layoutText('tinyCapture')
+    self.registry = layout.LayoutRegistry()
+
+  def tearDown(self):
+    os.chdir(self.cwd)
+    shutil.rmtree(self.directory)
+
+  def writeLayout(self, fileName):
+    with open(fileName, 'w') as f:
+      f.write(self.text + '\n')
+
+  def testSharesParsedLayouts(self):
+    self.writeLayout(os.path.join('layouts', 'mine.lay'))
+    found = self.registry.get('mine')
+    self.assertEqual(found.layoutText, self.text.split('\n'))
+    self.assertTrue(self.registry.get('mine.lay') is found)
+    self.assertEqual(self.registry.find('mine'), os.path.join(self.directory, 'layouts', 'mine.lay'))
+
+  def testFindsFilesWrittenAfterListing(self):
+    self.assertEqual(self.registry.get('later'), None)
+    self.writeLayout(os.path.join('layouts', 'later.lay'))
+    self.assertEqual(self.registry.get('later').layoutText, self.text.split('\n'))
+    self.writeLayout('beside.lay')
+    self.assertEqual(self.registry.find('beside'), os.path.join(self.directory, 'beside.lay'))
+
+  def testRefresh(self):
+    changed = self.text.replace('.', ' ', 1)
+    fingerprint = layout.textFingerprint(changed)
+    self.assertEqual(self.registry.findByFingerprint(fingerprint), None)
+    with open(os.path.join('layouts', 'changed.lay'), 'w') as f:
+      f.write(changed + '\n')
+    self.registry.refresh()
+    self.assertEqual(self.registry.findByFingerprint(fingerprint).layoutText, changed.split('\n'))
+
+  def testFallsBackToTheModuleDirectory(self):
+    self.assertEqual(self.registry.find('defaultCapture'), os.path.join(layout.LAYOUT_DIRECTORY, 'defaultCapture.lay'))
+    self.assertEqual(self.registry.find('noSuchLayout'), None)
+
+if __name__ == '__main__':
+  unittest.main()
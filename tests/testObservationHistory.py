@@ -0,0 +1,87 @@
+# testObservationHistory.py
+# -------------------------
+# Tests for captureAgents.ObservationHistory.
+
+import random, unittest
+import capture, layout
+from captureAgents import ObservationHistory
+
+def gameStates(count, seed=0):
+  "count states of a game on tinyCapture played with seeded random moves."
+  gameLayout = layout.getLayout('tinyCapture')
+  numAgents = len(gameLayout.agentPositions)
+  generator = random.Random(seed)
+  state = capture.GameState()
+  state.initialize(gameLayout, numAgents)
+  state.data.timeleft = 1200
+  states = [state]
+  while len(states) < count:
+    index = (len(states) - 1) % numAgents
+    state = state.generateSuccessor(index, generator.choice(sorted(state.getLegalActions(index))))
+    states.append(state)
+  return states
+
+class ObservationHistoryTest(unittest.TestCase):
+  def setUp(self):
+    self.states = gameStates(40)
+
+  def makeHistory(self, recent=5, limit=None):
+    history = ObservationHistory(recent, limit)
+    for state in self.states: history.append(state)
+    return history
+
+  def assertSameStates(self, observed, expected):
+    self.assertEqual(len(observed), len(expected))
+    for state, original in zip(observed, expected):
+      self.assertEqual(state, original)
+      self.assertEqual(state.data.timeleft, original.data.timeleft)
+      self.assertEqual(state.data.capsules, original.data.capsules)
+
+  def testPacksAllButTheRecentStates(self):
+    history = self.makeHistory()
+    self.assertEqual(len(history), 40)
+    self.assertEqual(len(history.packed), 35)
+    self.assertEqual(len(history.states), 5)
+    # The recent states are the very objects that were appended
+    for i in range(35, 40):
+      self.assertTrue(history[i] is self.states[i])
+
+  def testIndexing(self):
+    history = self.makeHistory()
+    self.assertSameStates([history[i] for i in range(40)], self.states)
+    self.assertSameStates([history[-1], history[-40]], [self.states[-1], self.states[0]])
+    self.assertRaises(IndexError, lambda: history[40])
+    self.assertRaises(IndexError, lambda: history[-41])
+
+  def testSlicesAndIteration(self):
+    history = self.makeHistory()
+    self.assertSameStates(history[3:30:4], self.states[3:30:4])
+    self.assertSameStates(history[-8:], self.states[-8:])
+    self.assertSameStates(history[::-1], self.states[::-1])
+    self.assertEqual(history[50:], [])
+    self.assertSameStates(list(history), self.states)
+
+  def testUnchangedFieldsAreShared(self):
+    history = self.makeHistory()
+    # The food is only eaten now and then, so consecutive states share it
+    shared = [i for i in range(1, len(history.packed)) if history.packed[i][0] is history.packed[i - 1][0]]
+    self.assertTrue(shared)
+
+  def testLimit(self):
+    history = self.makeHistory(recent=5, limit=12)
+    self.assertEqual(len(history), 12)
+    self.assertSameStates(list(history), self.states[-12:])
+    history = self.makeHistory(recent=20, limit=12)
+    self.assertEqual(len(history.packed), 0)
+    self.assertSameStates(list(history), self.states[-12:])
+
+  def testShortHistory(self):
+    history = ObservationHistory(5)
+    self.assertEqual(len(history), 0)
+    self.assertEqual(list(history), [])
+    for state in self.states[:3]: history.append(state)
+    self.assertEqual(len(history.packed), 0)
+    self.assertSameStates(list(history), self.states[:3])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,90 @@
+# testPhaseTimer.py
+# -----------------
+# Tests for the histograms of phaseTimer.py.
+
+import json, os, shutil, tempfile, unittest
+from phaseTimer import Histogram, PhaseTimer, BUCKET_RATIO, SMALLEST
+
+class HistogramTest(unittest.TestCase):
+  def testBuckets(self):
+    histogram = Histogram()
+    start = SMALLEST * BUCKET_RATIO ** 100.2
+    for seconds in [0.0, SMALLEST / 2, SMALLEST, start, start * BUCKET_RATIO ** 0.5, start * BUCKET_RATIO ** 2]:
+      histogram.add(seconds)
+    self.assertEqual(sorted(histogram.buckets.items()), [(0, 3), (100, 2), (102, 1)])
+    self.assertEqual(histogram.count, 6)
+
+  def testBucketsAreFivePercentWide(self):
+    for seconds in [2e-7, 3.3e-5, 1e-3, 0.25, 7.0]:
+      histogram = Histogram()
+      histogram.add(seconds)
+      histogram.add(1000.0)  # so the percentile is not capped by max
+      edge = histogram.percentile(50)
+      self.assertTrue(seconds <= edge <= seconds * BUCKET_RATIO * (1 + 1e-9), (seconds, edge))
+
+  def testPercentiles(self):
+    histogram = Histogram()
+    for ms in range(1, 101):
+      histogram.add(ms / 1000.0)
+    for p in [1, 50, 95, 99, 100]:
+      self.assertTrue(p / 1000.0 <= histogram.percentile(p) <= p / 1000.0 * BUCKET_RATIO, p)
+    self.assertEqual(histogram.percentile(100), 0.1)
+    self.assertEqual(Histogram().percentile(50), 0.0)
+
+  def testExactStatistics(self):
+    histogram = Histogram()
+    for seconds in [0.001, 0.002, 0.006]: histogram.add(seconds)
+    summary = histogram.summary()
+    self.assertEqual(summary['count'], 3)
+    self.assertAlmostEqual(summary['total'], 9.0)
+    self.assertAlmostEqual(summary['mean'], 3.0)
+    self.assertAlmostEqual(summary['max'], 6.0)
+
+  def testMerge(self):
+    a, b, both = Histogram(), Histogram(), Histogram()
+    for i in range(1, 40):
+      seconds = i * 1.7e-4
+      [a, b][i % 2].add(seconds)
+      both.add(seconds)
+    a.merge(b)
+    self.assertEqual(a.buckets, both.buckets)
+    self.assertEqual((a.count, a.max), (both.count, both.max))
+    self.assertAlmostEqual(a.total, both.total)
+
+class PhaseTimerTest(unittest.TestCase):
+  def makeTimer(self):
+    timer = PhaseTimer()
+    for i in range(10):
+      timer.record('getAction', i % 2, 0.01 * (i + 1))
+      timer.record('turn', i % 2, 0.02 * (i + 1))
+    timer.gameEnded()
+    return timer
+
+  def testSummary(self):
+    summary = self.makeTimer().summary()
+    self.assertEqual(summary['games'], 1)
+    self.assertEqual(sorted(summary['phases']), ['getAction', 'turn'])
+    getAction = summary['phases']['getAction']
+    self.assertEqual(getAction['all']['count'], 10)
+    self.assertEqual(sorted(getAction['agents']), ['0', '1'])
+    self.assertEqual(getAction['agents']['0']['count'], 5)
+    self.assertAlmostEqual(getAction['agents']['1']['max'], 100.0)
+    self.assertAlmostEqual(getAction['all']['total'], 550.0)
+
+  def testReportOrder(self):
+    lines = self.makeTimer().report().split('\n')
+    self.assertEqual([line.split()[0] for line in lines[1:]], ['getAction', 'turn'])
+
+  def testWrite(self):
+    directory = tempfile.mkdtemp()
+    try:
+      fileName = os.path.join(directory, 'timing.json')
+      timer = self.makeTimer()
+      timer.write(fileName)
+      with open(fileName) as f:
+        self.assertEqual(json.load(f), json.loads(json.dumps(timer.summary())))
+    finally:
+      shutil.rmtree(directory)
+
+if __name__ == '__main__':
+  unittest.main()
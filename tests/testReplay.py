@@ -0,0 +1,115 @@
+# testReplay.py
+# -------------
+# Tests for writing, reading and seeking in replays.
+
+import os, random, shutil, tempfile, unittest
+import capture, layout, replay, textDisplay
+from game import Agent, GameObserver
+
+class SeededAgent(Agent):
+  "Plays random legal moves from its own generator, so games repeat."
+  def __init__(self, index, seed):
+    Agent.__init__(self, index)
+    self.random = random.Random(seed)
+
+  def getAction(self, state):
+    return self.random.choice(sorted(state.getLegalActions(self.index)))
+
+class StateRecorder(GameObserver):
+  "Keeps the state after every move."
+  def __init__(self):
+    self.states = []
+
+  def gameStarted(self, game):
+    self.states.append(game.state)
+
+  def postSuccessor(self, game, agentIndex, action, state):
+    self.states.append(state)
+
+def playGame(fileName, length=300, keyframeEvery=replay.KEYFRAME_EVERY, embedLayout=True):
+  "Plays and records a game on tinyCapture; returns the states after each move."
+  gameLayout = layout.getLayout('tinyCapture')
+  random.seed(1)
+  agents = [SeededAgent(i, i) for i in range(len(gameLayout.agentPositions))]
+  rules = capture.CaptureRules(quiet=True)
+  game = rules.newGame(gameLayout, agents, textDisplay.NullGraphics(), length, True, False, training=True)
+  recorder = StateRecorder()
+  game.addObserver(recorder)
+  game.addObserver(replay.ReplayWriter(fileName, gameLayout, 'Red', 'Blue', seed=7,
+                                       embedLayout=embedLayout, keyframeEvery=keyframeEvery))
+  game.run()
+  return recorder.states
+
+class ReplayTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.fileName = os.path.join(self.directory, 'replay-0')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def assertSameState(self, state, expected):
+    self.assertEqual(state, expected)
+    self.assertEqual(state.data.timeleft, expected.data.timeleft)
+
+  def testRoundTrip(self):
+    states = playGame(self.fileName)
+    recorded = replay.readReplay(self.fileName)
+    self.assertTrue(recorded.complete)
+    self.assertEqual(len(recorded.actions), len(states) - 1)
+    self.assertEqual((recorded.redTeamName, recorded.blueTeamName, recorded.seed), ('Red', 'Blue', 7))
+    self.assertEqual(recorded.layout.fingerprint(), layout.getLayout('tinyCapture').fingerprint())
+    for move, state in recorded.states():
+      self.assertSameState(state, states[move])
+
+  def testKeyframes(self):
+    states = playGame(self.fileName, keyframeEvery=50)
+    recorded = replay.readReplay(self.fileName)
+    self.assertEqual(recorded.keyframeMoves, range(50, len(states), 50))
+    for move in [0, 1, 49, 50, 51, 149, 150, len(states) - 1]:
+      self.assertSameState(recorded.stateAt(move), states[move])
+    self.assertRaises(IndexError, recorded.stateAt, len(states))
+    self.assertRaises(IndexError, recorded.stateAt, -1)
+
+  def testStatesFromTheMiddle(self):
+    states = playGame(self.fileName, keyframeEvery=50)
+    recorded = replay.readReplay(self.fileName)
+    moves = list(recorded.states(75, 120))
+    self.assertEqual([move for move, state in moves], range(75, 121))
+    for move, state in moves:
+      self.assertSameState(state, states[move])
+
+  def testWithoutKeyframes(self):
+    states = playGame(self.fileName, keyframeEvery=0)
+    recorded = replay.readReplay(self.fileName)
+    self.assertEqual(recorded.keyframeMoves, [])
+    self.assertSameState(recorded.stateAt(len(states) - 1), states[-1])
+
+  def testLayoutFoundByFingerprint(self):
+    states = playGame(self.fileName, embedLayout=False)
+    recorded = replay.readReplay(self.fileName)
+    self.assertEqual(recorded.layout.fingerprint(), layout.getLayout('tinyCapture').fingerprint())
+    self.assertSameState(recorded.stateAt(len(states) - 1), states[-1])
+
+  def testCutOffReplay(self):
+    states = playGame(self.fileName, keyframeEvery=50)
+    with open(self.fileName, 'rb') as f:
+      data = f.read()
+    # Without the END byte
+    with open(self.fileName, 'wb') as f:
+      f.write(data[:-1])
+    recorded = replay.readReplay(self.fileName)
+    self.assertFalse(recorded.complete)
+    self.assertEqual(len(recorded.actions), len(states) - 1)
+
+    # Cut off in the middle of the last keyframe, which is then ignored
+    keyframe = data.rindex(chr(replay.KEYFRAME))
+    with open(self.fileName, 'wb') as f:
+      f.write(data[:keyframe + 10])
+    recorded = replay.readReplay(self.fileName)
+    self.assertFalse(recorded.complete)
+    self.assertEqual(recorded.keyframeMoves[-1], len(recorded.actions) - 50)
+    self.assertSameState(recorded.stateAt(len(recorded.actions)), states[len(recorded.actions)])
+
+if __name__ == '__main__':
+  unittest.main()
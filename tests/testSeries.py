@@ -0,0 +1,122 @@
+# testSeries.py
+# -------------
+# Tests for the sequential stopping rules of series.py.
+
+import unittest
+import series
+
+class NormalQuantileTest(unittest.TestCase):
+  def testKnownValues(self):
+    self.assertAlmostEqual(series.normalQuantile(0.5), 0.0, 9)
+    self.assertAlmostEqual(series.normalQuantile(0.975), 1.959963985, 8)
+    self.assertAlmostEqual(series.normalQuantile(0.01), -2.326347874, 8)
+
+  def testWilsonInterval(self):
+    self.assertEqual(series.wilsonInterval(0, 0, 0.05), (0.0, 1.0))
+    low, high = series.wilsonInterval(5, 10, 0.05)
+    self.assertAlmostEqual((low + high) / 2, 0.5)
+    self.assertTrue(0.0 < low < 0.5 < high < 1.0)
+
+class EmptySeriesTest(unittest.TestCase):
+  "Nothing may fail before the first game, as with maxGames 0."
+  def testNoGames(self):
+    for test in [series.WinRateSPRT(0.05, 0.05, 0.5, 0.65, 4),
+                 series.WinRateBound(0.05, 0.5, 4),
+                 series.MeanScoreBound(0.05, 0.0, 4)]:
+      self.assertEqual(test.lookAlpha(), 0.0)
+      self.assertEqual(test.decision(), None)
+      low, high = test.interval()
+      self.assertTrue(low <= high)
+      test.describe()
+
+class WinRateSPRTTest(unittest.TestCase):
+  def makeTest(self):
+    return series.WinRateSPRT(0.05, 0.05, 0.5, 0.65, 4)
+
+  def testAcceptsH1AfterWins(self):
+    test = self.makeTest()
+    games = 0
+    while test.decision() == None:
+      test.add(1)
+      games += 1
+    self.assertTrue(test.decision().startswith('H1 accepted'))
+    # log(0.95 / 0.05) / log(0.65 / 0.5) = 11.2
+    self.assertEqual(games, 12)
+
+  def testAcceptsH0AfterLosses(self):
+    test = self.makeTest()
+    while test.decision() == None: test.add(-1)
+    self.assertTrue(test.decision().startswith('H0 accepted'))
+
+  def testTiesCarryNoInformation(self):
+    test = self.makeTest()
+    for i in range(100): test.add(0)
+    self.assertEqual(test.llr(), 0.0)
+    self.assertEqual(test.decision(), None)
+
+  def testWaitsForMinGames(self):
+    test = series.WinRateSPRT(0.05, 0.05, 0.5, 0.65, 20)
+    for i in range(19):
+      test.add(1)
+      self.assertEqual(test.decision(), None)
+    test.add(1)
+    self.assertNotEqual(test.decision(), None)
+
+class WinRateBoundTest(unittest.TestCase):
+  def testStopsForAStrongerTeam(self):
+    test = series.WinRateBound(0.05, 0.5, 4)
+    while test.decision() == None: test.add(3)
+    self.assertTrue(test.decision().startswith('A is stronger'))
+    self.assertTrue(test.interval()[0] > 0.5)
+
+  def testStopsForAWeakerTeam(self):
+    test = series.WinRateBound(0.05, 0.5, 4)
+    while test.decision() == None: test.add(-3)
+    self.assertTrue(test.decision().startswith('B is stronger'))
+
+  def testEvenSeriesDoesNotStop(self):
+    test = series.WinRateBound(0.05, 0.5, 4)
+    for i in range(200):
+      test.add([1, -1][i % 2])
+      self.assertEqual(test.decision(), None)
+
+  def testLookAlphaSumsBelowAlpha(self):
+    test = series.WinRateBound(0.05, 0.5, 4)
+    spent = 0.0
+    for i in range(1000):
+      test.add(1)
+      spent += test.lookAlpha()
+    self.assertTrue(spent < 0.05)
+
+class MeanScoreBoundTest(unittest.TestCase):
+  def testEqualScoresDoNotStopAtOnce(self):
+    test = series.MeanScoreBound(0.05, 0.0, 2)
+    for i in range(series.MIN_SCORE_GAMES - 1):
+      test.add(1)
+      self.assertEqual(test.decision(), None)
+    low, high = test.interval()
+    self.assertTrue(high - low > 0)
+
+  def testEqualScoresStopEventually(self):
+    test = series.MeanScoreBound(0.05, 0.0, 2)
+    for i in range(100):
+      test.add(1)
+      if test.decision() != None: break
+    self.assertTrue(test.decision().startswith('A is stronger'))
+    self.assertTrue(len(test.scores) >= series.MIN_SCORE_GAMES)
+
+  def testStopsForAWeakerTeam(self):
+    test = series.MeanScoreBound(0.05, 0.0, 4)
+    for i in range(100):
+      test.add([-5, -3][i % 2])
+      if test.decision() != None: break
+    self.assertTrue(test.decision().startswith('B is stronger'))
+
+  def testMixedScoresDoNotStop(self):
+    test = series.MeanScoreBound(0.05, 0.0, 4)
+    for i in range(200):
+      test.add([10, -10][i % 2])
+      self.assertEqual(test.decision(), None)
+
+if __name__ == '__main__':
+  unittest.main()
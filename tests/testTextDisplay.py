@@ -0,0 +1,85 @@
+# testTextDisplay.py
+# ------------------
+# Tests for the incremental terminal renderer of textDisplay.py.
+
+import random, re, unittest
+import capture, layout, textDisplay
+
+def gameStates(count):
+  "count states of a game on tinyCapture played with seeded random moves."
+  gameLayout = layout.getLayout('tinyCapture')
+  numAgents = len(gameLayout.agentPositions)
+  generator = random.Random(0)
+  state = capture.GameState()
+  state.initialize(gameLayout, numAgents)
+  state.data.timeleft = 1200
+  states = [state]
+  while len(states) < count:
+    index = (len(states) - 1) % numAgents
+    state = state.generateSuccessor(index, generator.choice(sorted(state.getLegalActions(index))))
+    states.append(state)
+  return states
+
+class Terminal:
+  "Just enough of a VT100 to follow what TerminalRenderer writes."
+  def __init__(self):
+    self.lines = {}
+    self.row, self.column = 1, 1
+    self.saved = None
+
+  def write(self, text):
+    for token in re.findall(r'\x1b\[[0-9;]*[A-Za-z]|\x1b[78]|\n|[^\x1b\n]', text):
+      if token == '\n':
+        self.row, self.column = self.row + 1, 1
+      elif token == '\x1b7':
+        self.saved = (self.row, self.column)
+      elif token == '\x1b8':
+        self.row, self.column = self.saved
+      elif token == '\x1b[2J':
+        self.lines = {}
+      elif token == '\x1b[H':
+        self.row, self.column = 1, 1
+      elif token.endswith('H'):
+        self.row, self.column = [int(n) for n in token[2:-1].split(';')]
+      elif token == '\x1b[K':
+        line = self.lines.get(self.row, '')
+        self.lines[self.row] = line[:self.column - 1]
+      else:
+        line = self.lines.get(self.row, '').ljust(self.column - 1)
+        self.lines[self.row] = line[:self.column - 1] + token + line[self.column:]
+        self.column += 1
+
+  def flush(self):
+    pass
+
+  def text(self):
+    return [self.lines.get(row, '').rstrip() for row in range(1, max(self.lines) + 1)]
+
+class TerminalRendererTest(unittest.TestCase):
+  def setUp(self):
+    self.states = gameStates(30)
+    self.terminal = Terminal()
+    self.renderer = textDisplay.TerminalRenderer(self.terminal)
+
+  def board(self, state):
+    "The board and score lines as str(state) shows them."
+    return str(state).split('\n')[:state.data.layout.height + 1]
+
+  def testFramesMatchStr(self):
+    for state in self.states:
+      self.renderer.draw(state.data)
+      self.assertEqual(self.terminal.text()[:len(self.board(state))], self.board(state))
+
+  def testPrintedTextIsKept(self):
+    self.renderer.draw(self.states[0].data)
+    self.terminal.write('agent says hello\n')
+    for state in self.states[1:]:
+      self.renderer.draw(state.data)
+    self.terminal.write('Time is up.\nTie game!\n')
+    self.renderer.finish()
+    self.terminal.write('Average Score: 0\n')
+    board = self.board(self.states[-1])
+    self.assertEqual(self.terminal.text(), board + ['agent says hello', 'Time is up.', 'Tie game!', 'Average Score: 0'])
+
+if __name__ == '__main__':
+  unittest.main()
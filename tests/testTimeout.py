@@ -0,0 +1,65 @@
+# testTimeout.py
+# --------------
+# Tests for the sub-second and nested timeouts of util.py.
+
+import signal, time, unittest
+import util
+
+def spin(seconds):
+  "Busy-waits for seconds, as a slow agent would."
+  end = time.time() + seconds
+  while time.time() < end:
+    pass
+  return seconds
+
+class TimeoutFunctionTest(unittest.TestCase):
+  def setUp(self):
+    self.handler = signal.getsignal(signal.SIGALRM)
+
+  def tearDown(self):
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    self.assertEqual(signal.getsignal(signal.SIGALRM), self.handler)
+
+  def testSubSecondTimeout(self):
+    start = time.time()
+    self.assertRaises(util.TimeoutFunctionException, util.TimeoutFunction(spin, 0.05), 2.0)
+    self.assertTrue(time.time() - start < 0.5)
+    self.assertEqual(util.TimeoutFunction(spin, 0.5)(0.01), 0.01)
+    self.assertEqual(signal.getitimer(signal.ITIMER_REAL), (0.0, 0.0))
+
+  def testNoTimeLeft(self):
+    for timeout in [0, -1]:
+      self.assertRaises(util.TimeoutFunctionException, util.TimeoutFunction(spin, timeout), 0)
+
+  def testNestedTimeoutRestoresTheOuterTimer(self):
+    def outer():
+      util.TimeoutFunction(spin, 0.1)(0.02)
+      remaining = signal.getitimer(signal.ITIMER_REAL)[0]
+      self.assertTrue(0.4 < remaining < 0.49, remaining)
+      return spin(2.0)
+    start = time.time()
+    self.assertRaises(util.TimeoutFunctionException, util.TimeoutFunction(outer, 0.5))
+    self.assertTrue(0.45 < time.time() - start < 1.0)
+
+  def testOuterTimeoutDueFirst(self):
+    start = time.time()
+    outer = util.TimeoutFunction(util.TimeoutFunction(spin, 1.0), 0.05)
+    self.assertRaises(util.TimeoutFunctionException, outer, 2.0)
+    self.assertTrue(time.time() - start < 0.5)
+
+class DeadlineTest(unittest.TestCase):
+  def testRemaining(self):
+    deadline = util.Deadline(0.1, 0.05)
+    self.assertFalse(deadline.expired())
+    self.assertTrue(0.05 < deadline.timeRemaining() <= 0.1)
+    self.assertTrue(deadline.warningTimeRemaining() <= 0.05)
+    spin(0.06)
+    self.assertEqual(deadline.warningTimeRemaining(), 0.0)
+    self.assertFalse(deadline.expired())
+    spin(0.05)
+    self.assertTrue(deadline.expired())
+    self.assertEqual(deadline.timeRemaining(), 0.0)
+    self.assertTrue(deadline.timeElapsed() >= 0.1)
+
+if __name__ == '__main__':
+  unittest.main()
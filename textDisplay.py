@@ -12,7 +12,8 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
-import time
+import sys, time
+from util import nearestPoint
 try:
     import pacman
 except:
@@ -22,6 +23,7 @@ DRAW_EVERY = 1
 SLEEP_TIME = 0 # This can be overwritten by __init__
 DISPLAY_MOVES = False
 QUIET = False # Supresses output
+ANSI = True # Redraw only changed cells when stdout is a terminal
 
 class NullGraphics:
     def initialize(self, state, isBlue = False):
@@ -52,6 +54,9 @@ class PacmanGraphics:
             SLEEP_TIME = speed
 
     def initialize(self, state, isBlue = False):
+        self.renderer = None
+        if ANSI and not DISPLAY_MOVES and sys.stdout.isatty():
+            self.renderer = TerminalRenderer(sys.stdout)
         self.draw(state)
         self.pause()
         self.turn = 0
@@ -75,7 +80,95 @@ class PacmanGraphics:
         time.sleep(SLEEP_TIME)
 
     def draw(self, state):
-        print state
+        if self.renderer != None:
+            self.renderer.draw(state)
+        else:
+            print state
 
     def finish(self):
-        pass
+        if self.renderer != None:
+            self.renderer.finish()
+
+class TerminalRenderer:
+    """
+    Draws GameStateData the way str(state) prints it, but only sends the
+    terminal the cells that changed since the last frame, as ANSI cursor
+    movements, plus the score line when the score changed.  The board is
+    drawn at the top of the screen, which is cleared on the first frame.
+    Each update saves and restores the cursor, so it stays below the board
+    after whatever was printed there (agents' output, the end of game
+    messages), and later output follows that text instead of overwriting it.
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.screen = None
+
+    def cell(self, state, x, y):
+        "The character str(state) shows at (x, y), leaving agents and capsules out."
+        if state.food[x][y]: return '.'
+        if state.layout.walls[x][y]: return '%'
+        return ' '
+
+    def overlays(self, state):
+        "Agents and capsules, as {(x, y): character}, later ones on top as in str(state)."
+        chars = {}
+        for agentState in state.agentStates:
+            if agentState == None or agentState.configuration == None: continue
+            x, y = [int(i) for i in nearestPoint(agentState.configuration.pos)]
+            if agentState.isPacman:
+                chars[(x, y)] = state._pacStr(agentState.configuration.direction)
+            else:
+                chars[(x, y)] = state._ghostStr(agentState.configuration.direction)
+        for x, y in state.capsules:
+            chars[(x, y)] = 'o'
+        return chars
+
+    def draw(self, state):
+        width, height = state.layout.width, state.layout.height
+        overlays = self.overlays(state)
+        if self.screen == None:
+            self.screen = [[self.cell(state, x, y) for y in range(height)] for x in range(width)]
+            for (x, y), char in overlays.items():
+                self.screen[x][y] = char
+            self.food = [column[:] for column in state.food.data]
+            self.shown = overlays
+            self.score = state.score
+            rows = [''.join([self.screen[x][y] for x in range(width)]) for y in range(height - 1, -1, -1)]
+            self.out.write('\x1b[2J\x1b[H' + '\n'.join(rows) + '\nScore: %d\n' % state.score)
+            self.out.flush()
+            return
+
+        # Only cells whose food changed or that have or had an agent or capsule on them can differ
+        dirty = set(overlays) | set(self.shown)
+        for x, column in enumerate(state.food.data):
+            if column != self.food[x]:
+                dirty.update([(x, y) for y in range(height) if column[y] != self.food[x][y]])
+                self.food[x] = column[:]
+        self.shown = overlays
+
+        changes = []
+        for x, y in dirty:
+            char = overlays.get((x, y)) or self.cell(state, x, y)
+            if self.screen[x][y] != char:
+                self.screen[x][y] = char
+                changes.append((height - y, x + 1, char))
+        changes.sort()
+
+        output = []
+        lastRow, lastColumn = None, None
+        for row, column, char in changes:
+            if row != lastRow or column != lastColumn + 1:
+                output.append('\x1b[%d;%dH' % (row, column))
+            output.append(char)
+            lastRow, lastColumn = row, column
+        if state.score != self.score:
+            self.score = state.score
+            output.append('\x1b[%d;1HScore: %d\x1b[K' % (height + 1, state.score))
+        if output:
+            self.out.write('\x1b7' + ''.join(output) + '\x1b8')
+            self.out.flush()
+
+    def finish(self):
+        # The cursor is already on the line after the last one written
+        self.out.flush()
@@ -580,20 +580,50 @@ def pause():
 
 # code to handle timeouts
 #
-# FIXME
-# NOTE: TimeoutFuncton is NOT reentrant.  Later timeouts will silently
-# disable earlier timeouts.  Could be solved by maintaining a global list
-# of active time outs.  Currently, questions which have test cases calling
-# this have all student code so wrapped.
+# NOTE: TimeoutFunctions may be nested where signal.setitimer exists: an
+# inner one fires early if the enclosing timeout is due first, and hands
+# the enclosing timeout what is left of its time when it returns.  With
+# only signal.alarm, later timeouts still silently disable earlier ones.
 #
 import signal
 import time
+import math
+class Deadline:
+    """
+    The time limit of one agent call, handed to agents that define
+    setMoveDeadline so anytime searches can spend their budget exactly.
+
+    timeRemaining() is the time left before the call is cut off;
+    warningTimeRemaining() is the time left before it draws a time warning.
+    """
+    def __init__(self, timeout, warningTime=None):
+        self.start = time.time()
+        self.end = self.start + timeout
+        if warningTime == None: warningTime = timeout
+        self.warningEnd = self.start + warningTime
+
+    def timeElapsed(self):
+        return time.time() - self.start
+
+    def timeRemaining(self):
+        return max(0.0, self.end - time.time())
+
+    def warningTimeRemaining(self):
+        return max(0.0, self.warningEnd - time.time())
+
+    def expired(self):
+        return time.time() >= self.end
+
 class TimeoutFunctionException(Exception):
     """Exception to raise on a timeout"""
     pass
 
 
 class TimeoutFunction:
+    """
+    Wraps a function so that calling it raises TimeoutFunctionException
+    once timeout seconds (a float) have passed.
+    """
     def __init__(self, function, timeout):
         self.timeout = timeout
         self.function = function
@@ -605,9 +635,26 @@ class TimeoutFunction:
         # If we have SIGALRM signal, use it to cause an exception if and
         # when this function runs too long.  Otherwise check the time taken
         # after the method has returned, and throw an exception then.
-        if hasattr(signal, 'SIGALRM'):
+        if self.timeout <= 0:
+            # Nothing left; a zero timer would never fire
+            self.handle_timeout(None, None)
+        if hasattr(signal, 'setitimer'):
+            old = signal.signal(signal.SIGALRM, self.handle_timeout)
+            start = time.time()
+            outer = signal.setitimer(signal.ITIMER_REAL, self.timeout)[0]
+            if 0 < outer < self.timeout:
+                signal.setitimer(signal.ITIMER_REAL, outer)
+            try:
+                result = self.function(*args, **keyArgs)
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, old)
+                if outer > 0:
+                    # Give the enclosing timeout back what is left of its time
+                    signal.setitimer(signal.ITIMER_REAL, max(1e-6, outer - (time.time() - start)))
+        elif hasattr(signal, 'SIGALRM'):
             old = signal.signal(signal.SIGALRM, self.handle_timeout)
-            signal.alarm(self.timeout)
+            signal.alarm(int(math.ceil(self.timeout)))
             try:
                 result = self.function(*args, **keyArgs)
             finally:
@@ -631,6 +678,9 @@ class WritableNull:
     def write(self, string):
         pass
 
+    def flush(self):
+        pass
+
 def mutePrint():
     global _ORIGINAL_STDOUT, _ORIGINAL_STDERR, _MUTED
     if _MUTED: